@@ -1,42 +1,74 @@
-from typing import Dict, List, TypedDict, Annotated, Sequence
+from typing import Dict, List, TypedDict, Annotated, Sequence, Optional, Tuple
 from langchain_core.messages import HumanMessage, AIMessage
 from langchain_openai import ChatOpenAI
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from langgraph.graph import StateGraph, END, START
 import json
-from PIL import Image
-import base64
-from io import BytesIO
-import configparser
 import os
+from io import BytesIO
+from debate_my_ticket.backend.image_prep import prepare_image
+from debate_my_ticket.utils.checkpoint_store import get_checkpoint_saver
+from debate_my_ticket.utils.helpers import load_config
+from debate_my_ticket.utils.debate_context import DebateContextManager, count_tokens, summarization_prompt
+from debate_my_ticket.utils.ticket import Ticket
+from debate_my_ticket.utils.tracing import traced, tracer
 
-# Load API key from config file
-config = configparser.ConfigParser()
-config.read('api.cfg')
-os.environ["OPENAI_API_KEY"] = config['openai']['api_key']
+# Load API key from the shared config (read once per process)
+os.environ["OPENAI_API_KEY"] = load_config()['api_key']
 
 # State definition
 class DebateState(TypedDict):
     messages: List[Dict]
     ticket_info: Dict
+    # Canonical JSON of ticket_info, built once after info_gather and embedded in every turn's prompt
+    ticket_canonical: str
     current_turn: str  # "pro" or "anti"
     pro_messages: int
     anti_messages: int
     pro_gave_up: bool
     anti_gave_up: bool
+    # Rolling context compaction (filled in by DebateContextManager)
+    summary: str
+    summarized_turns: int
+    context_stats: List[Dict]
+    # Bytes and tokens saved by downsizing and re-encoding the ticket image (filled in by info_gather)
+    image_stats: Dict
 
 # Initialize LLMs
 gpt4_vision = ChatOpenAI(model="gpt-4o", max_tokens=1000)
 gpt4_mini = ChatOpenAI(model="gpt-4o", max_tokens=1000)
 
-def encode_image_to_base64(image: Image.Image) -> str:
-    buffered = BytesIO()
-    image.save(buffered, format="PNG")
-    return base64.b64encode(buffered.getvalue()).decode()
+# Debate context sent with each turn: last N turns verbatim, older ones folded into a summary
+CONTEXT_KEEP_LAST = 4
+CONTEXT_FOLD_BATCH = 4
+CONTEXT_TOKEN_BUDGET = 1200
+
+def summarize_turns(previous_summary: str, new_turns: List[Dict]) -> Tuple[str, int]:
+    """Fold older debate turns into the running summary; also returns the tokens the call used"""
+    prompt = summarization_prompt(previous_summary, new_turns)
+    response = gpt4_mini.invoke([HumanMessage(content=prompt)])
+    usage = getattr(response, "usage_metadata", None) or {}
+    tokens = usage.get("total_tokens") or count_tokens(prompt) + count_tokens(response.content)
+    return response.content, tokens
+
+context_manager = DebateContextManager(
+    summarize=summarize_turns,
+    keep_last=CONTEXT_KEEP_LAST,
+    fold_batch=CONTEXT_FOLD_BATCH,
+    token_budget=CONTEXT_TOKEN_BUDGET
+)
 
+@traced("graph.info_gather")
 def info_gather(state: DebateState) -> DebateState:
     """Extract information from the ticket image using GPT-4 Vision"""
-    image = state["ticket_info"]["image"]
-    base64_image = encode_image_to_base64(image)
+    # Downsized and compactly encoded once; the image (PIL image or upload bytes) is only needed
+    # here, so pop it to keep ticket_info JSON serializable
+    prepared = prepare_image(state["ticket_info"].pop("image"))
+    image_url = prepared.vision_data_url()
+    state["image_stats"] = prepared.vision_stats
+    span = tracer.current()
+    if span is not None:
+        span.set(**{key: value for key, value in prepared.vision_stats.items() if not isinstance(value, list)})
     
     prompt = """Analyze this ticket image and extract the following information:
     1. Address where the ticket was issued
@@ -53,7 +85,8 @@ def info_gather(state: DebateState) -> DebateState:
             {
                 "type": "image_url",
                 "image_url": {
-                    "url": f"data:image/png;base64,{base64_image}"
+                    "url": image_url,
+                    "detail": "high"
                 }
             }
         ])
@@ -65,9 +98,15 @@ def info_gather(state: DebateState) -> DebateState:
         state["ticket_info"].update(info)
     except:
         state["ticket_info"]["raw_text"] = response.content
+    # The ticket does not change after this point
+    state["ticket_canonical"] = Ticket.coerce(state["ticket_info"]).canonical
     
     return state
 
+def ticket_prompt(state: DebateState) -> str:
+    """The ticket as embedded in the turn prompts (rebuilt only for checkpoints saved without it)"""
+    return state.get("ticket_canonical") or Ticket.coerce(state["ticket_info"]).canonical
+
 def should_end(state: DebateState) -> bool:
     """Check if the debate should end"""
     return (state["pro_messages"] >= 5 and state["anti_messages"] >= 5) or state["pro_gave_up"] or state["anti_gave_up"]
@@ -83,22 +122,23 @@ def is_anti_turn(state: DebateState) -> bool:
 def router(state: DebateState) -> str:
     """Determine the next step in the debate"""
     if should_end(state):
-        return "end"
+        return END
     
-    return state["current_turn"]
+    return "pro_payment" if is_pro_turn(state) else "anti_payment"
 
+@traced("graph.pro_payment")
 def pro_payment(state: DebateState) -> DebateState:
     """Pro-payment agent's turn"""
-    messages = state["messages"]
-    ticket_info = state["ticket_info"]
+    debate_context = context_manager.render(state)
     
-    prompt = f"""You are arguing in favor of paying the ticket. Here's the ticket information:
-    {json.dumps(ticket_info, indent=2)}
+    # Ticket and debate so far first, shared with the other side's turns; the role comes last
+    prompt = f"""Here's the ticket information:
+    {ticket_prompt(state)}
     
     Previous debate:
-    {json.dumps(messages, indent=2)}
+    {debate_context}
     
-    Make your argument. If you want to give up, respond with "GIVE_UP"."""
+    You are arguing in favor of paying the ticket. Make your argument. If you want to give up, respond with "GIVE_UP"."""
     
     response = gpt4_mini.invoke([HumanMessage(content=prompt)])
     
@@ -111,18 +151,19 @@ def pro_payment(state: DebateState) -> DebateState:
     state["current_turn"] = "anti"
     return state
 
+@traced("graph.anti_payment")
 def anti_payment(state: DebateState) -> DebateState:
     """Anti-payment agent's turn"""
-    messages = state["messages"]
-    ticket_info = state["ticket_info"]
+    debate_context = context_manager.render(state)
     
-    prompt = f"""You are arguing against paying the ticket. Here's the ticket information:
-    {json.dumps(ticket_info, indent=2)}
+    # Ticket and debate so far first, shared with the other side's turns; the role comes last
+    prompt = f"""Here's the ticket information:
+    {ticket_prompt(state)}
     
     Previous debate:
-    {json.dumps(messages, indent=2)}
+    {debate_context}
     
-    Make your argument. If you want to give up, respond with "GIVE_UP"."""
+    You are arguing against paying the ticket. Make your argument. If you want to give up, respond with "GIVE_UP"."""
     
     response = gpt4_mini.invoke([HumanMessage(content=prompt)])
     
@@ -135,32 +176,56 @@ def anti_payment(state: DebateState) -> DebateState:
     state["current_turn"] = "pro"
     return state
 
-def create_debate_workflow() -> StateGraph:
-    """Create the debate workflow graph"""
+def create_debate_workflow(checkpointer: Optional[BaseCheckpointSaver] = None):
+    """Create the debate workflow graph; with a checkpointer the state is saved after every node"""
     workflow = StateGraph(DebateState)
     
     # Add nodes
     workflow.add_node("info_gather", info_gather)
-    workflow.add_node("router", router)
     workflow.add_node("pro_payment", pro_payment)
     workflow.add_node("anti_payment", anti_payment)
     
     # Add edges
     workflow.add_edge(START, "info_gather")
-    workflow.add_edge("info_gather", "router")
-    
-    # Add conditional edges from router
-    workflow.add_conditional_edges(
-        "router",
-        {
-            "pro_payment": is_pro_turn,
-            "anti_payment": is_anti_turn,
-            END: should_end
-        }
-    )
-    
-    # Add edges back to router
-    workflow.add_edge("pro_payment", "router")
-    workflow.add_edge("anti_payment", "router")
-    
-    return workflow.compile() 
\ No newline at end of file
+    
+    # Route to the next speaker (or the end) after the ticket is read and after every turn
+    for node in ("info_gather", "pro_payment", "anti_payment"):
+        workflow.add_conditional_edges(node, router, ["pro_payment", "anti_payment", END])
+    
+    return workflow.compile(checkpointer=checkpointer)
+
+def initial_state(ticket_info: Dict) -> DebateState:
+    """Build the starting state; ticket_info["image"] holds the upload bytes (or a PIL image)"""
+    ticket_info = dict(ticket_info)
+    image = ticket_info.get("image")
+    if image is not None and not isinstance(image, bytes):
+        # Checkpoints are serialized, so store the image as bytes rather than a PIL object
+        buffer = BytesIO()
+        image.save(buffer, format="PNG")
+        ticket_info["image"] = buffer.getvalue()
+    return {
+        "messages": [],
+        "ticket_info": ticket_info,
+        "ticket_canonical": "",
+        "current_turn": "pro",
+        "pro_messages": 0,
+        "anti_messages": 0,
+        "pro_gave_up": False,
+        "anti_gave_up": False,
+        "summary": "",
+        "summarized_turns": 0,
+        "context_stats": [],
+        "image_stats": {},
+    }
+
+def run_debate_workflow(ticket_info: Dict, thread_id: str,
+                        checkpointer: Optional[BaseCheckpointSaver] = None) -> DebateState:
+    """Run the debate for a thread, resuming from its last completed node if it was interrupted"""
+    graph = create_debate_workflow(checkpointer or get_checkpoint_saver())
+    config = {"configurable": {"thread_id": thread_id}}
+    snapshot = graph.get_state(config)
+    if snapshot.values and not snapshot.next:
+        # Finished earlier: nothing left to pay for
+        return snapshot.values
+    # Passing None continues from the saved checkpoint instead of starting over
+    return graph.invoke(None if snapshot.next else initial_state(ticket_info), config)
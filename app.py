@@ -1,18 +1,46 @@
 import streamlit as st
-from PIL import Image
 import json
-import io
-from debate_my_ticket.backend import OCRProcessor
-from debate_my_ticket.backend import InfoScraper
-from debate_my_ticket.backend import TicketValidator
-from debate_my_ticket.langgraph_runner import DebateRunner
-from debate_my_ticket.utils.helpers import load_debate_history
+from debate_my_ticket.pipeline import TicketPipeline
+from debate_my_ticket.backend import get_history_store
+from debate_my_ticket.utils.helpers import load_config_section
+from debate_my_ticket.utils.tracing import tracer
+from debate_my_ticket.utils.round_controller import describe_stop
 
-# Initialize components
-ocr_processor = OCRProcessor()
-info_scraper = InfoScraper()
-ticket_validator = TicketValidator()
-debate_runner = DebateRunner()
+@st.cache_resource(show_spinner=False)
+def get_pipeline() -> TicketPipeline:
+    """Build the stateless components once per process and share them across sessions and reruns."""
+    return TicketPipeline()
+
+@st.cache_resource(show_spinner=False)
+def start_metrics_server():
+    """Expose /metrics and /spans once per process when a [metrics] port is configured in api.cfg."""
+    settings = load_config_section('metrics')
+    if 'port' not in settings:
+        return None
+    return tracer.serve_metrics(int(settings['port']), settings.get('host', '127.0.0.1'))
+
+def render_debate_message(container, role: str, content: str):
+    """Render a single debate message in the given Streamlit container."""
+    if role == 'pro_payment':
+        container.info(f"**Pro-Payment Agent:** {content}")
+    elif role == 'anti_payment':
+        container.warning(f"**Anti-Payment Agent:** {content}")
+    elif role == 'summary':
+        container.success(f"**Summary:** {content}")
+
+def render_saved_analysis(record):
+    """Show a previously saved analysis from the history store."""
+    st.subheader(f"Saved analysis for ticket {record['ticket_number']}")
+    if record['validation_issues']:
+        st.warning("The following issues were found with this ticket:")
+        for issue in record['validation_issues']:
+            st.write(f"- {issue}")
+    for message in record['debate'] or []:
+        render_debate_message(st, message['role'], message['content'])
+    if record['debate_stop']:
+        st.caption(describe_stop(record['debate_stop']))
+    if record['summary']:
+        render_debate_message(st, 'summary', record['summary'])
 
 # Configure Streamlit page
 st.set_page_config(
@@ -21,6 +49,47 @@ st.set_page_config(
     layout="wide"
 )
 
+# Initialize components
+pipeline = get_pipeline()
+history_store = get_history_store()
+# The history store is shared by every visitor, so the sidebar only lists the analyses made in this
+# session unless the whole store is explicitly opened up with [history] shared = true in api.cfg
+shared_history = load_config_section('history').get('shared', 'false').lower() == 'true'
+if 'history_tickets' not in st.session_state:
+    st.session_state['history_tickets'] = []
+start_metrics_server()
+
+# Debate history is per user session, not shared through the process-wide pipeline
+if 'debate_runner' not in st.session_state:
+    st.session_state['debate_runner'] = pipeline.new_runner()
+debate_runner = st.session_state['debate_runner']
+
+with st.sidebar:
+    if st.button("Reset debate"):
+        debate_runner.reset()
+    show_timings = st.checkbox("Show stage timings")
+    
+    # Past analyses, newest first, a page at a time
+    st.subheader("History")
+    history_city = st.text_input("Filter by city")
+    history_page = st.number_input("Page", min_value=1, value=1, step=1)
+    if shared_history:
+        past_records = history_store.find(city=history_city or None, limit=20, offset=(history_page - 1) * 20)
+    else:
+        own_records = [history_store.get(number) for number in reversed(st.session_state['history_tickets'])]
+        own_records = [
+            record for record in own_records
+            if record and (not history_city or
+                           (record['ticket_info'] or {}).get('city', '').lower() == history_city.strip().lower())
+        ]
+        past_records = own_records[(history_page - 1) * 20:history_page * 20]
+    past_labels = {
+        record['ticket_number']: f"{record['ticket_number']} ({(record['ticket_info'] or {}).get('city', 'unknown city')})"
+        for record in past_records
+    }
+    selected_ticket = st.selectbox("Past analyses", [''] + list(past_labels),
+                                   format_func=lambda number: past_labels.get(number, '—'))
+
 # App title and description
 st.title("DebateMyTicket")
 st.markdown("""
@@ -28,6 +97,12 @@ st.markdown("""
     The agents will analyze the ticket details, local laws, and social context to provide a balanced perspective.
 """)
 
+if selected_ticket and (shared_history or selected_ticket in st.session_state['history_tickets']):
+    saved_record = history_store.get(selected_ticket)
+    if saved_record:
+        render_saved_analysis(saved_record)
+        st.markdown("---")
+
 # File uploader
 uploaded_file = st.file_uploader("Upload your ticket image", type=["jpg", "jpeg", "png"])
 
@@ -39,31 +114,18 @@ additional_context = st.text_area(
 )
 
 if uploaded_file is not None:
-    # Display the uploaded image
-    image = Image.open(uploaded_file)
-    st.image(image, caption="Uploaded Ticket", width=400)
+    # Display the uploaded image; the pipeline decodes the same bytes once for OCR
+    image_data = uploaded_file.getvalue()
+    st.image(image_data, caption="Uploaded Ticket", width=400)
     
     # Process button
     if st.button("Analyze Ticket"):
-        with st.spinner("Processing your ticket..."):
+        with st.spinner("Processing your ticket..."), tracer.span("app.analyze") as analysis_span:
             try:
-                # Convert PIL Image to bytes
-                img_byte_arr = io.BytesIO()
-                image.save(img_byte_arr, format=image.format)
-                img_byte_arr = img_byte_arr.getvalue()
-                
-                # Process image with OCR
-                ticket_info = ocr_processor.process_image(img_byte_arr)
-                
-                # Add additional context if provided
-                if additional_context:
-                    ticket_info['additional_context'] = additional_context
-                
-                # Gather legal and social context
-                context = info_scraper.gather_context(ticket_info)
-                
-                # Validate ticket
-                validation_issues = ticket_validator.validate_ticket(ticket_info)
+                # Extract the ticket, then gather context and validate it concurrently
+                run = pipeline.get_run(image_data=image_data, additional_context=additional_context)
+                pipeline.execute(run, ('context', 'validation'))
+                validation_issues = run.outputs['validation']
                 
                 # Display validation results
                 st.subheader("Ticket Validation")
@@ -74,26 +136,54 @@ if uploaded_file is not None:
                 else:
                     st.success("The ticket appears to be legally valid.")
                 
-                # Run debate
+                # Run debate, rendering each agent's turn as its tokens arrive
                 st.subheader("AI Debate")
-                debate_history = debate_runner.run_debate(ticket_info, context)
-                
-                # Display debate
-                for message in debate_history:
-                    if message['role'] == 'pro_payment':
-                        st.info(f"**Pro-Payment Agent:** {message['content']}")
-                    elif message['role'] == 'anti_payment':
-                        st.warning(f"**Anti-Payment Agent:** {message['content']}")
-                    elif message['role'] == 'summary':
-                        st.success(f"**Summary:** {message['content']}")
+                placeholders = {}
+                streamed_text = {}
+                debate_stop = None
+                for event in pipeline.stream_debate(run, debate_runner):
+                    if event['type'] == 'stop':
+                        debate_stop = event
+                        continue
+                    if event['role'] not in ('pro_payment', 'anti_payment'):
+                        continue
+                    index = event['index']
+                    if index not in placeholders:
+                        placeholders[index] = st.empty()
+                        streamed_text[index] = ""
+                    if event['type'] == 'start':
+                        continue
+                    if event['type'] == 'token':
+                        streamed_text[index] += event['content']
+                        text = streamed_text[index] + " ▌"
+                    else:
+                        text = event['content']
+                    render_debate_message(placeholders[index], event['role'], text)
+                if debate_stop:
+                    st.caption(describe_stop(debate_stop))
                 
                 # Add final summary
                 st.subheader("Final Summary")
-                summary = debate_runner.get_debate_summary()
-                st.success(summary)
+                summary_placeholder = st.empty()
+                summary = ""
+                for token in pipeline.stream_summary(run, debate_runner):
+                    summary += token
+                    summary_placeholder.success(summary + " ▌")
+                summary_placeholder.success(summary)
+                
+                # Keep the analysis so it can be reloaded from the sidebar later
+                record = pipeline.record(run.outputs)
+                record['ticket_number'] = record['ticket_info'].get('ticket_number') or run.key[:16]
+                history_store.save(record)
+                if record['ticket_number'] not in st.session_state['history_tickets']:
+                    st.session_state['history_tickets'].append(record['ticket_number'])
                 
             except Exception as e:
                 st.error(f"An error occurred: {str(e)}")
+        
+        if show_timings:
+            st.subheader("Stage Timings")
+            st.dataframe(tracer.spans(trace_id=analysis_span.trace_id), use_container_width=True)
 
 # Footer
 st.markdown("---")
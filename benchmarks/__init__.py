@@ -0,0 +1,6 @@
+"""Offline benchmarks for the ticket pipeline.
+
+Nothing here talks to OpenAI: the LLM stages are pointed at `fake_llm_server`, a local
+OpenAI-compatible stand-in with configurable latency and token rate, and the tickets come
+from `synthetic_tickets`. See `run_benchmark` for usage.
+"""
@@ -0,0 +1,225 @@
+"""Local OpenAI-compatible chat completions server for offline benchmarks.
+
+Usage:
+    python -m benchmarks.fake_llm_server --port 8799 --latency 0.4 --tokens-per-second 60
+
+Point the app at it with `api_base = http://127.0.0.1:8799/v1` in the [openai] section of api.cfg.
+Replies are canned but shaped like the real ones: extraction prompts get ticket JSON, validation
+prompts get a list of issues and everything else gets filler text of a fixed length.
+
+Prompt prefix caching is simulated the way OpenAI does it: once a prompt reaches the minimum
+cacheable length, the longest prefix already seen (in 128-token steps) is reported as
+usage.prompt_tokens_details.cached_tokens.
+"""
+import argparse
+import json
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, List, Optional
+
+FAKE_TICKET_FIELDS = {
+    'ticket_number': 'PN48213377',
+    'city': 'Springfield',
+    'address': '742 Evergreen Terrace',
+    'violation_code': '17-B',
+    'date': '03/14/2025 10:25 AM',
+    'officer_info': 'Officer Wiggum, Badge # 2231',
+    'fine_amount': '$75.00',
+}
+
+FAKE_VALIDATION = "1. The officer signature is not legible.\n2. The violation code is not explained on the ticket."
+
+# Prefix caching granularity and minimum prompt length, in tokens (~4 characters each)
+CACHE_BLOCK_TOKENS = 128
+CACHE_MIN_TOKENS = 1024
+
+FILLER_WORDS = ("the ticket record shows the fine is consistent with local rules and the "
+                "available evidence suggests that a careful review of signage timing and "
+                "procedure could matter for the outcome of any hearing").split()
+
+
+class FakeLLMServer:
+    """Serves /v1/chat/completions from a background thread, simulating model latency and speed."""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: float = 0.3,
+                 tokens_per_second: float = 80.0, reply_tokens: int = 80, cache_min_tokens: int = CACHE_MIN_TOKENS):
+        # latency: seconds before the first token; tokens_per_second: generation speed after that
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.reply_tokens = reply_tokens
+        self.cache_min_tokens = cache_min_tokens
+        self.requests: Counter = Counter()
+        self._prefixes: set = set()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def api_base(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    @property
+    def request_count(self) -> int:
+        with self._lock:
+            return sum(self.requests.values())
+
+    def start(self) -> 'FakeLLMServer':
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def reply_for(self, messages: List[Dict[str, Any]], max_tokens: Optional[int]) -> str:
+        """Pick a canned reply that the calling stage can parse."""
+        prompt = str(messages[-1].get('content', '')) if messages else ''
+        if 'Fields to extract' in prompt:
+            fields = re.findall(r'^- (\w+)\s*$', prompt, re.MULTILINE)
+            return json.dumps({field: FAKE_TICKET_FIELDS[field] for field in fields if field in FAKE_TICKET_FIELDS})
+        if 'legal flaws' in prompt:
+            return FAKE_VALIDATION
+        count = min(self.reply_tokens, max_tokens or self.reply_tokens)
+        return ' '.join(FILLER_WORDS[i % len(FILLER_WORDS)] for i in range(count))
+
+    @staticmethod
+    def usage(prompt_tokens: int, cached_tokens: int, text: str) -> Dict[str, Any]:
+        completion_tokens = len(text.split())
+        return {
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'total_tokens': prompt_tokens + completion_tokens,
+            'prompt_tokens_details': {'cached_tokens': min(cached_tokens, prompt_tokens)},
+        }
+
+    def cached_tokens(self, messages: List[Dict[str, Any]]) -> int:
+        """Report how many leading prompt tokens an earlier request already sent, and remember this prompt."""
+        prompt = ''.join(str(m.get('content', '')) for m in messages)
+        block = CACHE_BLOCK_TOKENS * 4
+        boundaries = [hash(prompt[:end]) for end in range(block, len(prompt) + 1, block)]
+        with self._lock:
+            cached = 0
+            for i, prefix in enumerate(boundaries):
+                if prefix not in self._prefixes:
+                    break
+                cached = (i + 1) * CACHE_BLOCK_TOKENS
+            self._prefixes.update(boundaries)
+        if len(prompt) // 4 < self.cache_min_tokens:
+            return 0
+        return cached
+
+    def _record(self, model: str):
+        with self._lock:
+            self.requests[model] += 1
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                if not self.path.rstrip('/').endswith('/chat/completions'):
+                    self.send_error(404)
+                    return
+                length = int(self.headers.get('Content-Length', 0))
+                request = json.loads(self.rfile.read(length) or b'{}')
+                model = request.get('model', 'fake')
+                server._record(model)
+
+                messages = request.get('messages', [])
+                text = server.reply_for(messages, request.get('max_tokens'))
+                prompt_tokens = sum(len(str(m.get('content', ''))) for m in messages) // 4
+                usage = server.usage(prompt_tokens, server.cached_tokens(messages), text)
+                completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+                time.sleep(server.latency)
+                if request.get('stream'):
+                    include_usage = (request.get('stream_options') or {}).get('include_usage')
+                    self._stream(completion_id, model, text, usage if include_usage else None)
+                else:
+                    time.sleep(len(text.split()) / server.tokens_per_second)
+                    self._complete(completion_id, model, text, usage)
+
+            def _complete(self, completion_id: str, model: str, text: str, usage: Dict[str, Any]):
+                body = json.dumps({
+                    'id': completion_id,
+                    'object': 'chat.completion',
+                    'created': int(time.time()),
+                    'model': model,
+                    'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': text}, 'finish_reason': 'stop'}],
+                    'usage': usage,
+                }).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _stream(self, completion_id: str, model: str, text: str, usage: Optional[Dict[str, Any]]):
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Connection', 'close')
+                self.end_headers()
+                words = text.split(' ')
+                for i, word in enumerate(words):
+                    delta = {'content': word if i == 0 else ' ' + word}
+                    if i == 0:
+                        delta['role'] = 'assistant'
+                    self._event(completion_id, model, delta, None)
+                    time.sleep(1 / server.tokens_per_second)
+                self._event(completion_id, model, {}, 'stop')
+                if usage is not None:
+                    # Like OpenAI with stream_options.include_usage: a last chunk without choices
+                    chunk = {'id': completion_id, 'object': 'chat.completion.chunk', 'created': int(time.time()),
+                             'model': model, 'choices': [], 'usage': usage}
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode('utf-8'))
+                self.wfile.write(b'data: [DONE]\n\n')
+                self.wfile.flush()
+                self.close_connection = True
+
+            def _event(self, completion_id: str, model: str, delta: Dict[str, Any], finish_reason: Optional[str]):
+                chunk = {
+                    'id': completion_id,
+                    'object': 'chat.completion.chunk',
+                    'created': int(time.time()),
+                    'model': model,
+                    'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}],
+                }
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode('utf-8'))
+                self.wfile.flush()
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Run a local OpenAI-compatible stand-in server.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8799)
+    parser.add_argument('--latency', type=float, default=0.3, help="Seconds before the first token")
+    parser.add_argument('--tokens-per-second', type=float, default=80.0, help="Generation speed")
+    parser.add_argument('--reply-tokens', type=int, default=80, help="Length of free-text replies")
+    parser.add_argument('--cache-min-tokens', type=int, default=CACHE_MIN_TOKENS, help="Shortest prompt with prefix caching")
+    args = parser.parse_args(argv)
+
+    server = FakeLLMServer(args.host, args.port, args.latency, args.tokens_per_second, args.reply_tokens,
+                           args.cache_min_tokens).start()
+    print(f"Fake LLM server listening on {server.api_base}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""Measure how much prompt text the ticket takes up, indented JSON versus the canonical form.
+
+Usage:
+    python -m benchmarks.prompt_size --tickets 40
+    python -m benchmarks.prompt_size --tickets 40 --prompts 8
+
+Synthetic tickets are parsed with the regex parser (no LLM, no OCR) and each one is serialized the
+way the prompts used to embed it (json.dumps with indent=2) and the way they do now
+(Ticket.canonical). --prompts is how many prompts of one ticket embed it: the validation call plus
+every opening argument and rebuttal of the debate.
+"""
+import argparse
+import json
+import time
+from typing import List, Optional
+
+from benchmarks.synthetic_tickets import generate_tickets
+from debate_my_ticket.backend.ticket_parser import TicketParser
+from debate_my_ticket.utils.debate_context import count_tokens
+from debate_my_ticket.utils.ticket import Ticket
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Compare the prompt size of indented and canonical ticket JSON.")
+    parser.add_argument('--tickets', type=int, default=24)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--prompts', type=int, default=7, help="Prompts per ticket that embed the ticket")
+    args = parser.parse_args(argv)
+
+    ticket_parser = TicketParser()
+    tickets = [Ticket.from_dict({**ticket_parser.parse(ticket['text']), 'additional_context': ticket['layout']})
+               for ticket in generate_tickets(args.tickets, args.seed)]
+
+    start = time.perf_counter()
+    indented = [json.dumps(ticket.to_dict(), indent=2) for ticket in tickets for _ in range(args.prompts)]
+    indented_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    canonical = [ticket.canonical for ticket in tickets for _ in range(args.prompts)]
+    canonical_seconds = time.perf_counter() - start
+
+    for name, texts, seconds in (('indent=2', indented, indented_seconds), ('canonical', canonical, canonical_seconds)):
+        chars = sum(len(text) for text in texts) / args.tickets
+        tokens = sum(count_tokens(text) for text in texts) / args.tickets
+        print(f"{name:<10} chars/ticket={chars:8.1f} tokens/ticket={tokens:7.1f} "
+              f"serialize_us/ticket={seconds / args.tickets * 1e6:7.1f}")
+    saved = 1 - sum(count_tokens(text) for text in canonical) / max(1, sum(count_tokens(text) for text in indented))
+    print(f"ticket prompt tokens saved: {saved:.1%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,241 @@
+"""End-to-end pipeline benchmark against the local fake LLM server.
+
+Usage:
+    python -m benchmarks.run_benchmark run --tickets 40 --concurrency 1 2 4 8
+    python -m benchmarks.run_benchmark run --input text --latency 0.5 --tokens-per-second 40
+    python -m benchmarks.run_benchmark compare benchmarks/results/abc1234.json benchmarks/results/def5678.json
+
+Every concurrency level gets a fresh pipeline, LLM cache, image cache and law store, so each
+ticket goes through OCR, parsing, context gathering, validation, the debate and the summary.
+With "--input text" OCR is skipped and the synthetic text goes straight to the parser.
+
+Results are written to benchmarks/results/<git sha>.json. Each level reports p50/p95 ticket
+latency, throughput, LLM calls per ticket, tokens per ticket (with the prompt tokens served from the
+fake server's prefix cache), p50 time per pipeline stage and the peak RSS of the process so far.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
+
+from benchmarks.fake_llm_server import FakeLLMServer, CACHE_MIN_TOKENS
+from benchmarks.synthetic_tickets import generate_tickets, render_ticket_image
+from debate_my_ticket.backend import OCRProcessor, InfoScraper, TicketValidator, LawStore, ImageResultCache
+from debate_my_ticket.pipeline import TicketPipeline
+from debate_my_ticket.utils.llm_cache import LLMCache
+from debate_my_ticket.utils.llm_client import LLMClient, DEFAULT_MODELS
+from debate_my_ticket.utils.llm_scheduler import LLMScheduler
+from debate_my_ticket.utils.tracing import tracer
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile, 0 for an empty list."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = min(len(ordered), max(1, math.ceil(pct / 100 * len(ordered))))
+    return ordered[rank - 1]
+
+
+def git_revision() -> str:
+    try:
+        sha = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], capture_output=True, text=True).stdout.strip()
+        return f"{sha}-dirty" if dirty else sha
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def build_pipeline(api_base: str, llm_cache: bool, max_connections: int) -> TicketPipeline:
+    """Build a pipeline with cold, private caches that sends every LLM call to api_base."""
+    cache = LLMCache(cache_dir=None, disabled_stages=() if llm_cache else set(DEFAULT_MODELS))
+    # The stand-in server has no quota, so the rate limits would only add artificial waits
+    client = LLMClient(config={'api_key': 'sk-benchmark', 'api_base': api_base, 'max_connections': str(max_connections)},
+                       cache=cache, scheduler=LLMScheduler(limits={}))
+    return TicketPipeline(
+        ocr_processor=OCRProcessor(image_cache=ImageResultCache(max_distance=0), llm_client=client),
+        info_scraper=InfoScraper(law_store=LawStore(':memory:'), llm_client=client),
+        validator=TicketValidator(llm_client=client),
+        llm_client=client
+    )
+
+
+def run_level(server: FakeLLMServer, tickets: List[Dict[str, Any]], concurrency: int, use_images: bool,
+              llm_cache: bool) -> Dict[str, Any]:
+    """Push every ticket through the full pipeline with the given number of tickets in flight."""
+    pipeline = build_pipeline(server.api_base, llm_cache, max_connections=max(20, concurrency * 4))
+    tracer.clear()
+    calls_before = server.request_count
+
+    def analyze(ticket: Dict[str, Any]) -> Optional[float]:
+        start = time.perf_counter()
+        try:
+            if use_images:
+                pipeline.run(('summary',), image_data=ticket['image'])
+            else:
+                pipeline.run(('summary',), text=ticket['text'])
+        except Exception as e:
+            print(f"Warning: {ticket['id']} failed: {str(e)}")
+            return None
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(analyze, tickets))
+    wall = time.perf_counter() - start
+
+    latencies = [latency for latency in results if latency is not None]
+    spans = tracer.spans()
+    stage_times: Dict[str, List[float]] = {}
+    for span in spans:
+        if span['name'].startswith('pipeline.'):
+            stage_times.setdefault(span['name'][len('pipeline.'):], []).append(span['duration_seconds'])
+    llm_spans = [span for span in spans if span['name'].startswith('llm.')]
+    llm_times: Dict[str, List[float]] = {}
+    # Per stage: [cached, uncached] prompt tokens summed over its calls
+    llm_prompt_tokens: Dict[str, List[int]] = {}
+    for span in llm_spans:
+        stage = span['name'][len('llm.'):]
+        llm_times.setdefault(stage, []).append(span['duration_seconds'])
+        cached = span.get('cached_prompt_tokens', 0)
+        tokens = llm_prompt_tokens.setdefault(stage, [0, 0])
+        tokens[0] += cached
+        tokens[1] += span.get('prompt_tokens', 0) - cached
+    count = len(tickets)
+    return {
+        'concurrency': concurrency,
+        'tickets': count,
+        'errors': count - len(latencies),
+        'wall_seconds': round(wall, 3),
+        'throughput_tickets_per_second': round(count / wall, 3) if wall else 0.0,
+        'latency_p50_seconds': round(percentile(latencies, 50), 3),
+        'latency_p95_seconds': round(percentile(latencies, 95), 3),
+        'llm_calls_per_ticket': round((server.request_count - calls_before) / count, 2),
+        'coalesced_calls_per_ticket': round(sum(span.get('coalesced', 0) for span in llm_spans) / count, 2),
+        'prompt_tokens_per_ticket': round(sum(span.get('prompt_tokens', 0) for span in llm_spans) / count, 1),
+        'cached_prompt_tokens_per_ticket': round(sum(span.get('cached_prompt_tokens', 0) for span in llm_spans) / count, 1),
+        'completion_tokens_per_ticket': round(sum(span.get('completion_tokens', 0) for span in llm_spans) / count, 1),
+        'stage_p50_seconds': {name: round(percentile(times, 50), 3) for name, times in stage_times.items()},
+        'llm_stage_p95_seconds': {name: round(percentile(times, 95), 3) for name, times in llm_times.items()},
+        'llm_stage_prompt_tokens': {name: {'cached': cached, 'uncached': uncached}
+                                    for name, (cached, uncached) in llm_prompt_tokens.items()},
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def run(args) -> Dict[str, Any]:
+    tickets = generate_tickets(args.tickets, args.seed)
+    use_images = args.input == 'image'
+    if use_images:
+        for ticket in tickets:
+            ticket['image'] = render_ticket_image(ticket['text'])
+
+    server = FakeLLMServer(latency=args.latency, tokens_per_second=args.tokens_per_second,
+                           reply_tokens=args.reply_tokens, cache_min_tokens=args.cache_min_tokens).start()
+    try:
+        levels = []
+        for concurrency in args.concurrency:
+            level = run_level(server, tickets, concurrency, use_images, args.llm_cache)
+            levels.append(level)
+            print(f"concurrency={concurrency:<3} p50={level['latency_p50_seconds']:.2f}s "
+                  f"p95={level['latency_p95_seconds']:.2f}s throughput={level['throughput_tickets_per_second']:.2f}/s "
+                  f"calls/ticket={level['llm_calls_per_ticket']} peak_rss={level['peak_rss_mb']}MB")
+    finally:
+        server.stop()
+
+    return {
+        'revision': git_revision(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': {
+            'tickets': args.tickets,
+            'seed': args.seed,
+            'input': args.input,
+            'latency': args.latency,
+            'tokens_per_second': args.tokens_per_second,
+            'reply_tokens': args.reply_tokens,
+            'cache_min_tokens': args.cache_min_tokens,
+            'llm_cache': args.llm_cache,
+        },
+        'levels': levels,
+    }
+
+
+COMPARED_METRICS = ('latency_p50_seconds', 'latency_p95_seconds', 'throughput_tickets_per_second',
+                    'llm_calls_per_ticket', 'peak_rss_mb')
+
+
+def compare(baseline_path: str, candidate_path: str):
+    """Print the change of each metric per concurrency level between two result files."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    with open(candidate_path) as f:
+        candidate = json.load(f)
+    if baseline['config'] != candidate['config']:
+        print("Warning: the runs used different settings, deltas may not be meaningful")
+    print(f"{baseline['revision']} -> {candidate['revision']}")
+    old_levels = {level['concurrency']: level for level in baseline['levels']}
+    for level in candidate['levels']:
+        old = old_levels.get(level['concurrency'])
+        if old is None:
+            continue
+        print(f"concurrency={level['concurrency']}")
+        for metric in COMPARED_METRICS:
+            before, after = old[metric], level[metric]
+            change = f"{(after - before) / before * 100:+.1f}%" if before else "n/a"
+            print(f"  {metric:<32} {before:>10} -> {after:<10} {change}")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark the ticket pipeline against a local fake LLM.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help="Run the benchmark and save the results")
+    run_parser.add_argument('--tickets', type=int, default=24, help="Synthetic tickets per concurrency level")
+    run_parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 2, 4, 8], help="Tickets in flight")
+    run_parser.add_argument('--input', choices=('image', 'text'), default='image', help="Feed images (with OCR) or text")
+    run_parser.add_argument('--seed', type=int, default=0)
+    run_parser.add_argument('--latency', type=float, default=0.3, help="Fake LLM seconds before the first token")
+    run_parser.add_argument('--tokens-per-second', type=float, default=80.0, help="Fake LLM generation speed")
+    run_parser.add_argument('--reply-tokens', type=int, default=80, help="Length of fake free-text replies")
+    run_parser.add_argument('--cache-min-tokens', type=int, default=CACHE_MIN_TOKENS,
+                            help="Shortest prompt the fake LLM applies prefix caching to")
+    run_parser.add_argument('--llm-cache', action='store_true', help="Keep the in-memory LLM response cache on")
+    run_parser.add_argument('-o', '--output', default=None, help="Result file (default benchmarks/results/<sha>.json)")
+
+    compare_parser = commands.add_parser('compare', help="Compare two saved result files")
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('candidate')
+    args = parser.parse_args(argv)
+
+    if args.command == 'compare':
+        compare(args.baseline, args.candidate)
+        return
+
+    results = run(args)
+    output = args.output or os.path.join(RESULTS_DIR, f"{results['revision']}.json")
+    if os.path.dirname(output):
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Saved results to {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""Deterministic synthetic tickets for benchmarks.
+
+Usage:
+    python -m benchmarks.synthetic_tickets out_dir/ --count 50
+
+Tickets cycle through the New York, San Francisco and Toronto layouts known to the local parser
+and an unstructured layout that needs the LLM extraction fallback, so a run exercises both paths.
+"""
+import argparse
+import io
+import os
+import random
+from typing import Dict, List, Optional
+
+from PIL import Image, ImageDraw, ImageFont
+
+STREETS = ['Broadway', 'Market St', 'Queen St W', 'Main St', 'Oak Ave', 'King St E', 'Mission St', '5th Ave']
+OFFICERS = ['J. Alvarez', 'P. Chen', 'M. Okafor', 'R. Singh', 'L. Moreau']
+
+
+def _date(rng: random.Random) -> str:
+    hour = rng.randint(1, 12)
+    return (f"{rng.randint(1, 12):02d}/{rng.randint(1, 28):02d}/2025 "
+            f"{hour}:{rng.randint(0, 59):02d} {'AM' if rng.random() < 0.5 else 'PM'}")
+
+
+def _new_york(rng: random.Random) -> str:
+    return "\n".join([
+        "THE CITY OF NEW YORK",
+        "DEPARTMENT OF FINANCE - PARKING VIOLATION",
+        f"Summons Number: {rng.randint(10 ** 9, 10 ** 10 - 1)}",
+        f"Date: {_date(rng)}",
+        f"Location: {rng.randint(1, 999)} {rng.choice(STREETS)}",
+        f"Violation Code: {rng.randint(1, 99)}",
+        f"Issuing Agency: Traffic Enforcement Badge # {rng.randint(1000, 9999)}",
+        f"Fine Amount: ${rng.choice([65, 95, 115])}.00",
+    ])
+
+
+def _san_francisco(rng: random.Random) -> str:
+    return "\n".join([
+        "SFMTA - CITY AND COUNTY OF SAN FRANCISCO",
+        f"Citation Number: SF{rng.randint(10 ** 7, 10 ** 8 - 1)}",
+        f"Date: {_date(rng)}",
+        f"Location: {rng.randint(1, 999)} {rng.choice(STREETS)}",
+        f"Violation: TRC 7.2.{rng.randint(20, 29)}",
+        f"Officer: {rng.choice(OFFICERS)} Badge # {rng.randint(100, 999)}",
+        f"Amount Due: ${rng.choice([96, 110, 125])}.00",
+    ])
+
+
+def _toronto(rng: random.Random) -> str:
+    return "\n".join([
+        "CITY OF TORONTO",
+        "PARKING INFRACTION NOTICE",
+        f"Tag Number: PM{rng.randint(10 ** 5, 10 ** 6 - 1)}",
+        f"Date: {_date(rng)}",
+        f"Location: {rng.randint(1, 999)} {rng.choice(STREETS)}",
+        f"Infraction Code: {rng.randint(1, 400)}",
+        f"Officer: {rng.choice(OFFICERS)}",
+        f"Set Fine: ${rng.choice([30, 50, 75])}.00",
+    ])
+
+
+def _unstructured(rng: random.Random) -> str:
+    return "\n".join([
+        "NOTICE OF PARKING OFFENCE",
+        f"Ref {rng.randint(10 ** 5, 10 ** 6 - 1)} issued near {rng.randint(1, 999)} {rng.choice(STREETS)}",
+        f"Pay {rng.choice([40, 60, 80])} dollars within 30 days or request a hearing",
+    ])
+
+
+LAYOUTS = [('new_york', _new_york), ('san_francisco', _san_francisco), ('toronto', _toronto),
+           ('unstructured', _unstructured)]
+
+
+def generate_tickets(count: int, seed: int = 0) -> List[Dict[str, str]]:
+    """Generate ticket texts, the same ones for the same count and seed."""
+    rng = random.Random(seed)
+    tickets = []
+    for i in range(count):
+        layout, build = LAYOUTS[i % len(LAYOUTS)]
+        tickets.append({'id': f"ticket-{i:04d}", 'layout': layout, 'text': build(rng)})
+    return tickets
+
+
+def render_ticket_image(text: str, font_size: int = 28) -> bytes:
+    """Render ticket text as a PNG that tesseract can read."""
+    try:
+        font = ImageFont.load_default(size=font_size)
+    except TypeError:
+        # Pillow < 10.1 only has the small bitmap font
+        font = ImageFont.load_default()
+    lines = text.split("\n")
+    line_height = int(font_size * 1.5)
+    width = max(len(line) for line in lines) * font_size * 2 // 3 + 80
+    image = Image.new('RGB', (width, line_height * len(lines) + 80), 'white')
+    draw = ImageDraw.Draw(image)
+    for i, line in enumerate(lines):
+        draw.text((40, 40 + i * line_height), line, fill='black', font=font)
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Write synthetic ticket images to a directory.")
+    parser.add_argument('output_dir', help="Directory to write the images to")
+    parser.add_argument('--count', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    for ticket in generate_tickets(args.count, args.seed):
+        with open(os.path.join(args.output_dir, f"{ticket['id']}.png"), 'wb') as f:
+            f.write(render_ticket_image(ticket['text']))
+    print(f"Wrote {args.count} tickets to {args.output_dir}")
+
+
+if __name__ == '__main__':
+    main()
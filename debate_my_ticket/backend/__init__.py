@@ -1,5 +1,12 @@
 from .ocr_processor import OCRProcessor
 from .info_scraper import InfoScraper
 from .ticket_validator import TicketValidator
+from .validation_rules import RuleEngine, ValidationIssue
+from .law_store import LawStore
+from .history_store import HistoryStore, get_history_store
+from .ticket_parser import TicketParser, CityTemplate
+from .image_cache import ImageResultCache, get_image_cache
+from .image_prep import PreparedImage, prepare_image
 
-__all__ = ['OCRProcessor', 'InfoScraper', 'TicketValidator']
+__all__ = ['OCRProcessor', 'InfoScraper', 'TicketValidator', 'RuleEngine', 'ValidationIssue', 'LawStore', 'HistoryStore', 'get_history_store', 'TicketParser', 'CityTemplate',
+           'ImageResultCache', 'get_image_cache', 'PreparedImage', 'prepare_image']
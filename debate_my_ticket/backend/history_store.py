@@ -0,0 +1,247 @@
+"""SQLite store of analyzed tickets: extracted fields, context, validation, debate and summary.
+
+Import existing history and look tickets up:
+    python -m debate_my_ticket.backend.history_store migrate debate_my_ticket/history/
+    python -m debate_my_ticket.backend.history_store migrate results.jsonl
+    python -m debate_my_ticket.backend.history_store find --city "New York" --limit 20
+    python -m debate_my_ticket.backend.history_store stats
+
+migrate accepts the directory of per-ticket JSON debate files written by older versions, or a
+JSONL file of batch results. Records are keyed by ticket number; saving a ticket again updates
+the fields that were given and keeps the others.
+"""
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Any, List, Iterable, Optional
+
+from debate_my_ticket.backend.law_store import normalize_city, normalize_violation_code
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'history.db')
+LEGACY_HISTORY_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'history')
+
+# Record fields stored as JSON text, in column order
+JSON_FIELDS = ('ticket_info', 'field_sources', 'context', 'validation_issues', 'validation_details',
+               'debate', 'debate_stop')
+
+
+class HistoryStore:
+    def __init__(self, db_path: str = DEFAULT_DB_PATH):
+        self.db_path = db_path
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            # WAL lets the app read while a batch import is writing
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            json_columns = ''.join(f"{field} TEXT, " for field in JSON_FIELDS)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS tickets ("
+                "ticket_number TEXT PRIMARY KEY, city TEXT, violation_code TEXT, "
+                f"city_key TEXT, violation_key TEXT, {json_columns}summary TEXT, "
+                "created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS tickets_city_violation ON tickets (city_key, violation_key)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS tickets_violation ON tickets (violation_key)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS tickets_updated ON tickets (updated_at)")
+
+    def save(self, record: Dict[str, Any]):
+        """Insert or update one ticket record; it needs at least a 'ticket_number'."""
+        self.save_many([record])
+
+    def save_many(self, records: Iterable[Dict[str, Any]]) -> int:
+        """Insert or update many records in a single transaction and return how many were written."""
+        now = time.time()
+        rows = [self._to_row(record, now) for record in records]
+        columns = ['ticket_number', 'city', 'violation_code', 'city_key', 'violation_key',
+                   *JSON_FIELDS, 'summary', 'created_at', 'updated_at']
+        # Fields left out of a record keep their stored value
+        updates = ', '.join(f"{column} = COALESCE(excluded.{column}, tickets.{column})"
+                            for column in columns if column not in ('ticket_number', 'created_at'))
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f"INSERT INTO tickets ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) "
+                f"ON CONFLICT(ticket_number) DO UPDATE SET {updates}",
+                [[row[column] for column in columns] for row in rows]
+            )
+        return len(rows)
+
+    def get(self, ticket_number: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM tickets WHERE ticket_number = ?", (str(ticket_number),)).fetchone()
+        return self._from_row(row) if row else None
+
+    def get_debate(self, ticket_number: str) -> Optional[List[Dict[str, str]]]:
+        record = self.get(ticket_number)
+        return record['debate'] if record else None
+
+    def find(self, city: Optional[str] = None, violation_code: Optional[str] = None,
+             limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
+        """Get a page of records, newest first, optionally for one city and/or violation code."""
+        where, params = self._filters(city, violation_code)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT * FROM tickets{where} ORDER BY updated_at DESC, ticket_number LIMIT ? OFFSET ?",
+                (*params, limit, offset)
+            ).fetchall()
+        return [self._from_row(row) for row in rows]
+
+    def count(self, city: Optional[str] = None, violation_code: Optional[str] = None) -> int:
+        where, params = self._filters(city, violation_code)
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM tickets{where}", params).fetchone()[0]
+
+    def migrate_json_dir(self, history_dir: str = LEGACY_HISTORY_DIR, batch_size: int = 500) -> Dict[str, int]:
+        """Import the per-ticket JSON debate files written by older versions (the files are kept)."""
+        counts = {'imported': 0, 'failed': 0}
+        batch = []
+        with os.scandir(history_dir) as entries:
+            for entry in entries:
+                if not entry.name.endswith('.json'):
+                    continue
+                try:
+                    with open(entry.path, 'r') as f:
+                        debate = json.load(f)
+                except (OSError, ValueError) as e:
+                    print(f"Warning: could not read {entry.path}: {str(e)}")
+                    counts['failed'] += 1
+                    continue
+                batch.append({'ticket_number': entry.name[:-len('.json')], 'debate': debate})
+                if len(batch) >= batch_size:
+                    counts['imported'] += self.save_many(batch)
+                    batch = []
+        if batch:
+            counts['imported'] += self.save_many(batch)
+        return counts
+
+    def migrate_batch_results(self, path: str, batch_size: int = 500) -> Dict[str, int]:
+        """Import the successful records of a batch results JSONL file."""
+        counts = {'imported': 0, 'failed': 0}
+        batch = []
+        with open(path, 'r') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    counts['failed'] += 1
+                    continue
+                if record.get('status') != 'ok':
+                    continue
+                ticket_info = record.get('ticket_info') or {}
+                batch.append({**record, 'ticket_number': ticket_info.get('ticket_number') or record['id']})
+                if len(batch) >= batch_size:
+                    counts['imported'] += self.save_many(batch)
+                    batch = []
+        if batch:
+            counts['imported'] += self.save_many(batch)
+        return counts
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            count, cities = self._conn.execute("SELECT COUNT(*), COUNT(DISTINCT city_key) FROM tickets").fetchone()
+        return {'tickets': count, 'cities': cities, 'db_path': self.db_path}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    @staticmethod
+    def _filters(city: Optional[str], violation_code: Optional[str]):
+        clauses, params = [], []
+        if city:
+            clauses.append("city_key = ?")
+            params.append(normalize_city(city))
+        if violation_code:
+            clauses.append("violation_key = ?")
+            params.append(normalize_violation_code(violation_code))
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    @staticmethod
+    def _to_row(record: Dict[str, Any], now: float) -> Dict[str, Any]:
+        if not record.get('ticket_number'):
+            raise ValueError("A history record needs a ticket_number")
+        ticket_info = record.get('ticket_info') or {}
+        city = ticket_info.get('city')
+        violation_code = ticket_info.get('violation_code')
+        row = {
+            'ticket_number': str(record['ticket_number']),
+            'city': city,
+            'violation_code': violation_code,
+            'city_key': normalize_city(city) if city else None,
+            'violation_key': normalize_violation_code(violation_code) if violation_code else None,
+            'summary': record.get('summary'),
+            'created_at': now,
+            'updated_at': now,
+        }
+        for field in JSON_FIELDS:
+            row[field] = json.dumps(record[field]) if record.get(field) is not None else None
+        return row
+
+    @staticmethod
+    def _from_row(row: sqlite3.Row) -> Dict[str, Any]:
+        record = {
+            'ticket_number': row['ticket_number'],
+            'summary': row['summary'],
+            'created_at': row['created_at'],
+            'updated_at': row['updated_at'],
+        }
+        for field in JSON_FIELDS:
+            record[field] = json.loads(row[field]) if row[field] is not None else None
+        return record
+
+
+_default_store: Optional[HistoryStore] = None
+_default_store_lock = threading.Lock()
+
+
+def get_history_store() -> HistoryStore:
+    """Get the process-wide history store."""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = HistoryStore()
+        return _default_store
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Manage the ticket history store.")
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help="Path to the SQLite store")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    migrate = subparsers.add_parser('migrate', help="Import legacy JSON history files or batch results")
+    migrate.add_argument('source', nargs='?', default=LEGACY_HISTORY_DIR,
+                         help="Directory of <ticket_number>.json files or a JSONL file of batch results")
+    find = subparsers.add_parser('find', help="List stored tickets, newest first")
+    find.add_argument('--ticket-number')
+    find.add_argument('--city')
+    find.add_argument('--violation-code')
+    find.add_argument('--limit', type=int, default=20)
+    find.add_argument('--offset', type=int, default=0)
+    subparsers.add_parser('stats', help="Show store statistics")
+    args = parser.parse_args(argv)
+
+    store = HistoryStore(args.db)
+    if args.command == 'stats':
+        print(json.dumps(store.get_stats(), indent=2))
+    elif args.command == 'migrate':
+        if os.path.isdir(args.source):
+            counts = store.migrate_json_dir(args.source)
+        else:
+            counts = store.migrate_batch_results(args.source)
+        print(f"Imported {counts['imported']} tickets ({counts['failed']} failed)")
+    elif args.ticket_number:
+        print(json.dumps(store.get(args.ticket_number), indent=2))
+    else:
+        for record in store.find(args.city, args.violation_code, args.limit, args.offset):
+            ticket_info = record['ticket_info'] or {}
+            print(f"{record['ticket_number']}\t{ticket_info.get('city', '')}\t{ticket_info.get('violation_code', '')}\t"
+                  f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(record['updated_at']))}")
+
+
+if __name__ == '__main__':
+    main()
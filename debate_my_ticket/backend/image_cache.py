@@ -0,0 +1,133 @@
+import copy
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Callable, Optional, Tuple
+
+from PIL import Image
+
+
+def exact_hash(image: Image.Image) -> str:
+    """Hash the decoded pixels, so the same photo re-encoded or re-uploaded still matches."""
+    rgb = image.convert('RGB')
+    digest = hashlib.sha256(f"{rgb.size[0]}x{rgb.size[1]}:".encode('utf-8'))
+    digest.update(rgb.tobytes())
+    return digest.hexdigest()
+
+
+def perceptual_hash(image: Image.Image, hash_size: int = 16) -> int:
+    """Difference hash: compares neighbouring pixels of a small grayscale thumbnail."""
+    pixels = list(image.convert('L').resize((hash_size + 1, hash_size), Image.LANCZOS).getdata())
+    value = 0
+    for row in range(hash_size):
+        for col in range(hash_size):
+            left = pixels[row * (hash_size + 1) + col]
+            right = pixels[row * (hash_size + 1) + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+class ImageResultCache:
+    """LRU cache of extraction results keyed on exact and perceptual image hashes."""
+
+    def __init__(self, max_entries: int = 256, max_bytes: int = 16 * 1024 * 1024,
+                 max_distance: int = 0, hash_size: int = 16):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        # Hamming distance (out of hash_size**2 bits) still treated as the same photo; 0 (the default)
+        # only serves exact matches. Different tickets on the same printed form can be this close, so
+        # near matches are only returned once the caller confirms them (see get).
+        self.max_distance = max_distance
+        self.hash_size = hash_size
+        self._entries: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._stats = {'exact_hits': 0, 'near_hits': 0, 'near_rejected': 0, 'misses': 0, 'evictions': 0}
+
+    def get(self, image: Image.Image, confirm: Optional[Callable[[Any], bool]] = None) -> Optional[Any]:
+        """Return a copy of the stored result for an identical image.
+
+        A near-identical image is only served when confirm(result) says it is the same ticket;
+        without confirm near matches are treated as misses.
+        """
+        key = exact_hash(image)
+        phash = perceptual_hash(image, self.hash_size) if self.max_distance and confirm is not None else None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._stats['exact_hits'] += 1
+                return copy.deepcopy(entry['value'])
+            near_key, entry = (None, None)
+            if phash is not None:
+                near_key, entry = self._nearest(phash)
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            value = copy.deepcopy(entry['value'])
+
+        # Confirming may be slow (e.g. OCR), so it runs outside the lock
+        confirmed = confirm(value)
+        with self._lock:
+            if not confirmed:
+                self._stats['near_rejected'] += 1
+                self._stats['misses'] += 1
+                return None
+            if near_key in self._entries:
+                self._entries.move_to_end(near_key)
+            self._stats['near_hits'] += 1
+        return value
+
+    def put(self, image: Image.Image, value: Any):
+        """Store a result for an image, evicting least recently used entries when over budget."""
+        key = exact_hash(image)
+        phash = perceptual_hash(image, self.hash_size) if self.max_distance else None
+        size = len(json.dumps(value, default=str))
+        with self._lock:
+            if key in self._entries:
+                self._size -= self._entries.pop(key)['size']
+            self._entries[key] = {'phash': phash, 'value': copy.deepcopy(value), 'size': size}
+            self._size += size
+            while self._entries and (len(self._entries) > self.max_entries or self._size > self.max_bytes):
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= evicted['size']
+                self._stats['evictions'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters, the hit rate and the current cache size."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+            stats['bytes'] = self._size
+        lookups = stats['exact_hits'] + stats['near_hits'] + stats['misses']
+        stats['hit_rate'] = (stats['exact_hits'] + stats['near_hits']) / lookups if lookups else 0.0
+        return stats
+
+    def _nearest(self, phash: int) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+        best_key, best_entry, best_distance = None, None, self.max_distance + 1
+        for key, entry in self._entries.items():
+            if entry['phash'] is None:
+                continue
+            distance = bin(phash ^ entry['phash']).count('1')
+            if distance < best_distance:
+                best_key, best_entry, best_distance = key, entry, distance
+        return best_key, best_entry
+
+
+_default_cache: Optional[ImageResultCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_image_cache() -> ImageResultCache:
+    """Get the process-wide image result cache, shared across Streamlit reruns and sessions."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ImageResultCache()
+        return _default_cache
@@ -0,0 +1,139 @@
+"""Decode a ticket image once and encode a compact copy for the vision model.
+
+Report what the encoding saves for some photos:
+    python -m debate_my_ticket.backend.image_prep ticket1.jpg ticket2.png
+
+OCR reads the full-resolution decoded image; the vision model gets a copy downsized to the
+resolution it actually uses and encoded as the smaller of JPEG and WebP.
+"""
+import argparse
+import base64
+import io
+import json
+import math
+from typing import Dict, Any, List, Optional, Tuple, Union
+
+from PIL import Image, ImageOps, features
+
+# GPT-4o high-detail images are scaled to fit 2048x2048 and then to a 768px shortest side;
+# anything larger is only extra upload bytes
+VISION_MAX_SIDE = 2048
+VISION_SHORT_SIDE = 768
+# Keep lowering the quality until the encoded image fits this budget (or MIN_QUALITY is reached)
+VISION_MAX_BYTES = 400 * 1024
+DEFAULT_QUALITY = 85
+MIN_QUALITY = 50
+
+
+def vision_tokens(width: int, height: int, detail: str = 'high') -> int:
+    """Estimate the prompt tokens GPT-4o bills for an image of the given size."""
+    if detail == 'low':
+        return 85
+    scale = min(1.0, VISION_MAX_SIDE / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, VISION_SHORT_SIDE / min(width, height))
+    width, height = width * scale, height * scale
+    return 85 + 170 * math.ceil(width / 512) * math.ceil(height / 512)
+
+
+def vision_size(width: int, height: int) -> Tuple[int, int]:
+    """The largest size that still carries information for the vision model."""
+    scale = min(1.0, VISION_MAX_SIDE / max(width, height), VISION_SHORT_SIDE / min(width, height))
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+class PreparedImage:
+    """An uploaded ticket decoded once and shared by OCR and the vision model."""
+
+    def __init__(self, image: Image.Image, original_bytes: Optional[int], original_format: Optional[str]):
+        self.image = image
+        # Size of the upload; None when the image was handed over already decoded
+        self.original_bytes = original_bytes
+        self.original_format = original_format
+        self._vision: Optional[Tuple[bytes, str, Dict[str, Any]]] = None
+
+    def vision_payload(self) -> Tuple[bytes, str, Dict[str, Any]]:
+        """Get the downsized, compactly encoded image for the vision model, with its savings stats."""
+        if self._vision is None:
+            self._vision = encode_for_vision(self.image, self.original_bytes)
+        return self._vision
+
+    def vision_data_url(self) -> str:
+        data, mime_type, _ = self.vision_payload()
+        return f"data:{mime_type};base64,{base64.b64encode(data).decode()}"
+
+    @property
+    def vision_stats(self) -> Dict[str, Any]:
+        return self.vision_payload()[2]
+
+
+def prepare_image(source: Union[bytes, Image.Image]) -> PreparedImage:
+    """Decode image bytes once (or wrap an already decoded image), applying the EXIF orientation."""
+    if isinstance(source, Image.Image):
+        # Not re-encoded just to measure it: that would cost more than the vision copy saves
+        image, original_bytes = source, None
+    else:
+        image, original_bytes = Image.open(io.BytesIO(source)), len(source)
+    original_format = image.format
+    image.load()
+    # Phone photos are often stored sideways with an orientation tag, which OCR ignores
+    image = ImageOps.exif_transpose(image)
+    return PreparedImage(image, original_bytes, original_format)
+
+
+def encode_for_vision(image: Image.Image, original_bytes: Optional[int] = None,
+                      max_bytes: int = VISION_MAX_BYTES) -> Tuple[bytes, str, Dict[str, Any]]:
+    """Downsize to the model's useful resolution and encode as the smaller of JPEG and WebP."""
+    size = vision_size(*image.size)
+    resized = image.convert('RGB')
+    if size != image.size:
+        resized = resized.resize(size, Image.LANCZOS)
+
+    formats = ['JPEG', 'WEBP'] if features.check('webp') else ['JPEG']
+    quality = DEFAULT_QUALITY
+    while True:
+        candidates = [(_encode(resized, image_format, quality), image_format) for image_format in formats]
+        data, image_format = min(candidates, key=lambda candidate: len(candidate[0]))
+        if len(data) <= max_bytes or quality <= MIN_QUALITY:
+            break
+        quality -= 10
+
+    original_tokens = vision_tokens(*image.size)
+    encoded_tokens = vision_tokens(*size)
+    stats = {
+        'original_size': list(image.size),
+        'encoded_size': list(size),
+        'format': image_format,
+        'quality': quality,
+        'original_bytes': original_bytes,
+        'encoded_bytes': len(data),
+        'bytes_saved': original_bytes - len(data) if original_bytes is not None else None,
+        'original_tokens': original_tokens,
+        'encoded_tokens': encoded_tokens,
+        'tokens_saved': original_tokens - encoded_tokens,
+    }
+    return data, f"image/{image_format.lower()}", stats
+
+
+def _encode(image: Image.Image, image_format: str, quality: int) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format, quality=quality, optimize=image_format == 'JPEG')
+    return buffer.getvalue()
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Report the bytes and vision tokens saved for ticket images.")
+    parser.add_argument('images', nargs='+', help="Image files")
+    parser.add_argument('--max-bytes', type=int, default=VISION_MAX_BYTES, help="Byte budget for the encoded image")
+    args = parser.parse_args(argv)
+
+    for path in args.images:
+        with open(path, 'rb') as f:
+            data = f.read()
+        prepared = prepare_image(data)
+        _, _, stats = encode_for_vision(prepared.image, prepared.original_bytes, args.max_bytes)
+        print(json.dumps({'image': path, **stats}))
+
+
+if __name__ == '__main__':
+    main()
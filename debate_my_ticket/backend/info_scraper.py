@@ -1,31 +1,68 @@
 import requests
-from typing import Dict, Any
+from typing import Dict, Any, Optional, Iterable, Tuple
 import json
-from litellm import completion
-import litellm
-from debate_my_ticket.utils.helpers import load_config
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from debate_my_ticket.utils.llm_client import LLMClient, get_llm_client
+from debate_my_ticket.backend.law_store import LawStore
+from debate_my_ticket.utils.tracing import tracer, traced, submit_in_context
 
 class InfoScraper:
-    def __init__(self):
-        config = load_config()
-        self.api_key = config['api_key']
-        # Configure litellm to use OpenAI directly without proxies
-        litellm.set_verbose = True
-        litellm.api_key = self.api_key
+    def __init__(self, law_store: Optional[LawStore] = None, llm_client: Optional[LLMClient] = None):
+        self.law_store = law_store or LawStore()
+        self.llm = llm_client or get_llm_client()
     
     def gather_context(self, ticket_info: Dict[str, Any]) -> Dict[str, Any]:
         """Gather legal and social context for the ticket."""
-        context = {
-            'local_laws': self._get_local_laws(ticket_info),
-            'social_context': self._get_social_context(ticket_info)
-        }
+        # The two lookups are independent, so run them side by side
+        with tracer.span("scraper.gather_context"), ThreadPoolExecutor(max_workers=2) as executor:
+            local_laws = submit_in_context(executor, self._get_local_laws, ticket_info)
+            social_context = submit_in_context(executor, self._get_social_context, ticket_info)
+            context = {
+                'local_laws': local_laws.result(),
+                'social_context': social_context.result()
+            }
         return context
     
+    async def agather_context(self, ticket_info: Dict[str, Any]) -> Dict[str, Any]:
+        """Gather legal and social context concurrently from async code."""
+        local_laws, social_context = await asyncio.gather(
+            asyncio.to_thread(self._get_local_laws, ticket_info),
+            asyncio.to_thread(self._get_social_context, ticket_info)
+        )
+        return {
+            'local_laws': local_laws,
+            'social_context': social_context
+        }
+    
+    @traced("scraper.local_laws")
     def _get_local_laws(self, ticket_info: Dict[str, Any]) -> str:
-        """Get relevant local laws for the ticket."""
-        city = ticket_info.get('city', '').lower()
+        """Get relevant local laws for the ticket, from the law store when possible."""
+        city = ticket_info.get('city', '')
         violation_code = ticket_info.get('violation_code', '')
         
+        entry = self.law_store.lookup(city, violation_code)
+        tracer.current().set(law_store='miss' if entry is None else 'stale' if entry['stale'] else 'hit')
+        if entry is not None and not entry['stale']:
+            return entry['summary']
+        
+        try:
+            summary = self._query_local_laws(city, violation_code)
+        except Exception as e:
+            tracer.record_fallback(e)
+            # An outdated summary is still better than none
+            if entry is not None:
+                return entry['summary']
+            return f"Error gathering local laws: {str(e)}"
+        
+        if city and violation_code:
+            self.law_store.put(city, violation_code, summary)
+        return summary
+    
+    def _query_local_laws(self, city: str, violation_code: str) -> str:
+        """Ask the LLM for the laws relevant to a city and violation code."""
+        city = city.lower()
+        
         # This is a placeholder. In a real implementation, you would:
         # 1. Query a legal database API
         # 2. Scrape city/municipal websites
@@ -38,22 +75,35 @@ class InfoScraper:
         3. Common defenses
         4. Appeal process"""
         
-        try:
-            response = completion(
-                model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": "You are a legal research assistant."},
-                    {"role": "user", "content": prompt}
-                ],
-                api_key=self.api_key,
-                max_tokens=1000,
-                temperature=0.3,
-                timeout=30
-            )
-            return response.choices[0].message.content
-        except Exception as e:
-            return f"Error gathering local laws: {str(e)}"
+        response = self.llm.complete(
+            "local_laws",
+            [
+                {"role": "system", "content": "You are a legal research assistant."},
+                {"role": "user", "content": prompt}
+            ],
+            max_tokens=1000
+        )
+        return response.choices[0].message.content
+    
+    def precompute_local_laws(self, pairs: Iterable[Tuple[str, str]], refresh: bool = False) -> Dict[str, int]:
+        """Fill the law store for (city, violation_code) pairs, optionally refreshing stale entries."""
+        counts = {'stored': 0, 'skipped': 0, 'failed': 0}
+        for city, violation_code in pairs:
+            entry = self.law_store.get(city, violation_code)
+            if entry is not None and (not entry['stale'] or not refresh):
+                counts['skipped'] += 1
+                continue
+            try:
+                summary = self._query_local_laws(city, violation_code)
+            except Exception as e:
+                print(f"Warning: could not fetch laws for {city} / {violation_code}: {str(e)}")
+                counts['failed'] += 1
+                continue
+            self.law_store.put(city, violation_code, summary, source='precompute')
+            counts['stored'] += 1
+        return counts
     
+    @traced("scraper.social_context")
     def _get_social_context(self, ticket_info: Dict[str, Any]) -> str:
         """Get social context from various sources."""
         city = ticket_info.get('city', '')
@@ -72,17 +122,15 @@ class InfoScraper:
         4. Public sentiment"""
         
         try:
-            response = completion(
-                model="gpt-4",
-                messages=[
+            response = self.llm.complete(
+                "social_context",
+                [
                     {"role": "system", "content": "You are a social media analyst."},
                     {"role": "user", "content": prompt}
                 ],
-                api_key=self.api_key,
-                max_tokens=1000,
-                temperature=0.3,
-                timeout=30
+                max_tokens=1000
             )
             return response.choices[0].message.content
         except Exception as e:
+            tracer.record_fallback(e)
             return f"Error gathering social context: {str(e)}" 
\ No newline at end of file
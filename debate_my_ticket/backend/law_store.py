@@ -0,0 +1,162 @@
+"""Persistent store of local-law summaries keyed by (city, violation code).
+
+Warm the store for the city/code pairs that make up most traffic:
+    python -m debate_my_ticket.backend.law_store warm pairs.csv
+    python -m debate_my_ticket.backend.law_store warm results.jsonl --refresh-stale
+    python -m debate_my_ticket.backend.law_store stats
+
+pairs.csv holds "city,violation_code" rows. A JSONL file of batch results is also accepted,
+and the pairs are read from each record's ticket_info.
+"""
+import argparse
+import csv
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'laws.db')
+DEFAULT_MAX_AGE_DAYS = 90
+
+
+def normalize_city(city: str) -> str:
+    """Normalize a city name so 'New York, NY' and ' new york ny' share an entry."""
+    return re.sub(r'[^a-z0-9]+', ' ', (city or '').lower()).strip()
+
+
+def normalize_violation_code(violation_code: str) -> str:
+    """Normalize a violation code by upper-casing it and dropping spacing and symbols."""
+    return re.sub(r'[^A-Z0-9.\-]+', '', str(violation_code or '').upper())
+
+
+class LawStore:
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, max_age_days: float = DEFAULT_MAX_AGE_DAYS):
+        self.db_path = db_path
+        self.max_age_seconds = max_age_days * 24 * 3600
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'stale': 0, 'misses': 0}
+        with self._lock, self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS local_laws (
+                    city TEXT NOT NULL,
+                    violation_code TEXT NOT NULL,
+                    summary TEXT NOT NULL,
+                    source TEXT NOT NULL,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (city, violation_code)
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_local_laws_updated_at ON local_laws (updated_at)")
+
+    def get(self, city: str, violation_code: str) -> Optional[Dict[str, Any]]:
+        """Get the stored entry for a city and violation code, with its staleness flag."""
+        key = (normalize_city(city), normalize_violation_code(violation_code))
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM local_laws WHERE city = ? AND violation_code = ?", key
+            ).fetchone()
+        if row is None:
+            return None
+        entry = dict(row)
+        entry['stale'] = time.time() - entry['updated_at'] > self.max_age_seconds
+        return entry
+
+    def lookup(self, city: str, violation_code: str) -> Optional[Dict[str, Any]]:
+        """Get an entry and count it as a hit, stale hit or miss."""
+        entry = self.get(city, violation_code)
+        with self._lock:
+            if entry is None:
+                self._stats['misses'] += 1
+            elif entry['stale']:
+                self._stats['stale'] += 1
+            else:
+                self._stats['hits'] += 1
+        return entry
+
+    def put(self, city: str, violation_code: str, summary: str, source: str = 'llm'):
+        """Insert or refresh the summary for a city and violation code."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO local_laws (city, violation_code, summary, source, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (normalize_city(city), normalize_violation_code(violation_code), summary, source, time.time())
+            )
+
+    def stale_keys(self) -> List[Tuple[str, str]]:
+        """List the (city, violation_code) pairs older than the maximum age."""
+        cutoff = time.time() - self.max_age_seconds
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT city, violation_code FROM local_laws WHERE updated_at < ?", (cutoff,)
+            ).fetchall()
+        return [(row['city'], row['violation_code']) for row in rows]
+
+    def get_stats(self) -> Dict[str, int]:
+        """Get lookup counters and the number of stored entries."""
+        with self._lock:
+            count = self._conn.execute("SELECT COUNT(*) FROM local_laws").fetchone()[0]
+            return {**self._stats, 'entries': count}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def _read_pairs(path: str) -> List[Tuple[str, str]]:
+    """Read city/violation code pairs from a CSV file or a JSONL file of batch results."""
+    pairs = []
+    with open(path, 'r', newline='') as f:
+        if path.endswith('.jsonl'):
+            for line in f:
+                try:
+                    ticket_info = json.loads(line).get('ticket_info') or {}
+                except ValueError:
+                    continue
+                pairs.append((ticket_info.get('city', ''), ticket_info.get('violation_code', '')))
+        else:
+            for row in csv.reader(f):
+                if len(row) >= 2 and row[0].strip().lower() != 'city':
+                    pairs.append((row[0], row[1]))
+    # Deduplicate on the normalized key while keeping the first spelling seen
+    unique = {}
+    for city, code in pairs:
+        key = (normalize_city(city), normalize_violation_code(code))
+        if all(key):
+            unique.setdefault(key, (city, code))
+    return list(unique.values())
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Manage the local-law knowledge store.")
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help="Path to the SQLite store")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    warm = subparsers.add_parser('warm', help="Precompute law summaries for city/violation code pairs")
+    warm.add_argument('pairs', nargs='?', help="CSV of city,violation_code or JSONL of batch results")
+    warm.add_argument('--refresh-stale', action='store_true', help="Also refresh entries past their maximum age")
+    subparsers.add_parser('stats', help="Show store statistics")
+    args = parser.parse_args(argv)
+
+    store = LawStore(args.db)
+    if args.command == 'stats':
+        print(json.dumps(store.get_stats(), indent=2))
+        return
+
+    # Imported here so 'stats' works without API credentials
+    from debate_my_ticket.backend.info_scraper import InfoScraper
+    pairs = _read_pairs(args.pairs) if args.pairs else []
+    if args.refresh_stale:
+        pairs.extend(store.stale_keys())
+    scraper = InfoScraper(law_store=store)
+    counts = scraper.precompute_local_laws(pairs, refresh=args.refresh_stale)
+    print(f"Stored {counts['stored']} summaries ({counts['skipped']} already fresh, {counts['failed']} failed)")
+
+
+if __name__ == '__main__':
+    main()
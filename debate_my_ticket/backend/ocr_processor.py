@@ -1,54 +1,111 @@
 import pytesseract
-from PIL import Image
-import io
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple, Union
 import json
-from debate_my_ticket.utils.prompts import INFO_EXTRACTION_PROMPT
-from litellm import completion
-import litellm
-from debate_my_ticket.utils.helpers import load_config
+from debate_my_ticket.utils.prompts import FIELD_EXTRACTION_PROMPT
+from debate_my_ticket.utils.llm_client import LLMClient, get_llm_client
+from debate_my_ticket.utils.helpers import REQUIRED_TICKET_FIELDS
+from debate_my_ticket.utils.ticket import Ticket
+from debate_my_ticket.backend.ticket_parser import TicketParser
+from debate_my_ticket.backend.image_cache import ImageResultCache, get_image_cache
+from debate_my_ticket.backend.image_prep import PreparedImage, prepare_image
+from debate_my_ticket.utils.tracing import tracer
 
 class OCRProcessor:
-    def __init__(self):
-        config = load_config()
-        self.api_key = config['api_key']
-        # Configure litellm to use OpenAI directly without proxies
-        litellm.set_verbose = True
-        litellm.api_key = self.api_key
+    def __init__(self, parser: Optional[TicketParser] = None, image_cache: Optional[ImageResultCache] = None,
+                 llm_client: Optional[LLMClient] = None):
+        self.parser = parser or TicketParser()
+        self.image_cache = image_cache or get_image_cache()
+        self.llm = llm_client or get_llm_client()
     
-    def process_image(self, image_data: bytes) -> Dict[str, Any]:
+    def process_image(self, image_data: Union[bytes, PreparedImage]) -> Ticket:
         """Process image and extract text using OCR."""
-        try:
-            # Convert bytes to PIL Image
-            image = Image.open(io.BytesIO(image_data))
-            
-            # Perform OCR
-            text = pytesseract.image_to_string(image)
-            
-            # Extract structured information using GPT
-            extracted_info = self._extract_structured_info(text)
-            
-            return extracted_info
-        except Exception as e:
-            raise Exception(f"Error processing image: {str(e)}")
+        ticket_info, _ = self.process_image_with_sources(image_data)
+        return ticket_info
+    
+    def process_image_with_sources(self, image_data: Union[bytes, PreparedImage]) -> Tuple[Ticket, Dict[str, str]]:
+        """Process image and also report whether each field came from the 'parser' or the 'llm'."""
+        with tracer.span("ocr.process_image") as span:
+            try:
+                # Decode once; an already prepared image is shared with the vision model
+                prepared = image_data if isinstance(image_data, PreparedImage) else prepare_image(image_data)
+                image = prepared.image
+                if prepared.original_bytes is not None:
+                    span.set(image_bytes=prepared.original_bytes)
+                
+                text = None
+                
+                def same_ticket(cached) -> bool:
+                    # A near-identical photo can be another ticket on the same city form: the ticket
+                    # number read from this image has to match the cached one
+                    nonlocal text
+                    with tracer.span("ocr.tesseract"):
+                        text = pytesseract.image_to_string(image)
+                    number = self.parser.parse(text).get('ticket_number')
+                    return number is not None and number == cached[0].get('ticket_number')
+                
+                # Re-uploads of the same (or a confirmed near-identical) photo skip OCR and extraction
+                cached = self.image_cache.get(image, confirm=same_ticket)
+                span.set(image_cache_hit=cached is not None)
+                if cached is not None:
+                    ticket_info, sources = cached
+                    return Ticket.from_dict(ticket_info), sources
+                
+                # Perform OCR (unless confirming a near match already did)
+                if text is None:
+                    with tracer.span("ocr.tesseract"):
+                        text = pytesseract.image_to_string(image)
+                
+                ticket, sources = self.process_text_with_sources(text)
+                self.image_cache.put(image, (ticket.to_dict(), sources))
+                return ticket, sources
+            except Exception as e:
+                raise Exception(f"Error processing image: {str(e)}")
+    
+    @staticmethod
+    def extract_text(image_data: bytes) -> str:
+        """Run tesseract on the image bytes (no LLM call, safe to run in a worker process)."""
+        return pytesseract.image_to_string(prepare_image(image_data).image)
+    
+    def process_text(self, text: str) -> Ticket:
+        """Extract structured ticket information from already recognized text."""
+        ticket_info, _ = self.process_text_with_sources(text)
+        return ticket_info
+    
+    def process_text_with_sources(self, text: str) -> Tuple[Ticket, Dict[str, str]]:
+        """Extract fields with the local parser first and ask GPT only for the ones it missed."""
+        with tracer.span("ocr.parse") as span:
+            ticket_info = self.parser.parse(text)
+            span.set(parsed_fields=len(ticket_info))
+        sources = {field: 'parser' for field in ticket_info}
+        
+        missing_fields = [field for field in REQUIRED_TICKET_FIELDS if field not in ticket_info]
+        if not missing_fields:
+            return Ticket.from_dict(ticket_info), sources
+        
+        # Always ask for the canonical field names (all of them when the parser found nothing), so the
+        # answer merges into the same keys the validation rules check
+        extracted_info = self._extract_structured_info(text, missing_fields)
+        for field, value in extracted_info.items():
+            if field in missing_fields:
+                ticket_info[field] = value
+                sources[field] = 'llm'
+        return Ticket.from_dict(ticket_info), sources
     
-    def _extract_structured_info(self, text: str) -> Dict[str, Any]:
-        """Extract structured information from OCR text using GPT."""
+    def _extract_structured_info(self, text: str, fields: List[str]) -> Dict[str, Any]:
+        """Extract the given fields from OCR text using GPT."""
+        prompt = FIELD_EXTRACTION_PROMPT.format(ticket_text=text, fields="\n".join(f"- {field}" for field in fields))
         try:
-            response = completion(
-                model="gpt-4o",
-                messages=[
+            response = self.llm.complete(
+                "extraction",
+                [
                     {"role": "system", "content": "You are a helpful assistant that extracts information from ticket text."},
-                    {"role": "user", "content": INFO_EXTRACTION_PROMPT.format(ticket_text=text)}
+                    {"role": "user", "content": prompt}
                 ],
-                api_key=self.api_key,
-                max_tokens=1000,
-                temperature=0.3,
-                timeout=30
+                max_tokens=1000
             )
             
             # Parse the response as JSON
             extracted_info = json.loads(response.choices[0].message.content)
             return extracted_info
         except Exception as e:
-            raise Exception(f"Error extracting structured information: {str(e)}") 
\ No newline at end of file
+            raise Exception(f"Error extracting structured information: {str(e)}")
\ No newline at end of file
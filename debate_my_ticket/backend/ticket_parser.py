@@ -0,0 +1,141 @@
+import re
+from typing import Dict, Any, List, Optional, Pattern
+
+from debate_my_ticket.utils.helpers import REQUIRED_TICKET_FIELDS
+
+# Patterns that work on most ticket layouts; city templates override them where they know better
+GENERIC_PATTERNS: Dict[str, List[str]] = {
+    'ticket_number': [
+        r'(?:ticket|citation|notice|summons|violation)\s*(?:no\.?|number|num\.?|#)\s*[:#]?\s*([A-Z0-9][A-Z0-9\-]{4,})',
+    ],
+    'city': [
+        r'\bcity\s*(?:of)?\s*[:#]\s*([A-Za-z .\'-]+?)\s*(?:\n|$|,)',
+        r'\bcity of ([A-Z][A-Za-z .\'-]+?)\s*(?:\n|$|,)',
+    ],
+    'address': [
+        r'(?:location|address|place of (?:occurrence|violation)|street)\s*[:#]\s*(.+)',
+    ],
+    'violation_code': [
+        r'(?:violation|viol\.?)\s*(?:code|no\.?|#)\s*[:#]?\s*([A-Z0-9][A-Z0-9.\-()]{0,15})',
+        # A bare "code" also matches "Zip Code 94103", so only section references count here
+        r'\b(?:section|sec\.?)\s*[:#]?\s*(\d[\dA-Z.\-()]{0,15})',
+    ],
+    'date': [
+        r'(?:date|issued on|date of (?:offense|violation))\s*(?:/\s*time)?\s*[:#]?\s*'
+        r'(\d{1,2}[/\-.]\d{1,2}[/\-.]\d{2,4}(?:\s+\d{1,2}:\d{2}\s*(?:[AaPp][Mm])?)?)',
+        r'\b(\d{4}-\d{2}-\d{2}(?:[ T]\d{1,2}:\d{2})?)\b',
+        r'\b(\d{1,2}/\d{1,2}/\d{2,4}(?:\s+\d{1,2}:\d{2}\s*(?:[AaPp][Mm])?)?)\b',
+    ],
+    'officer_info': [
+        r'(?:officer|issued by|issuing officer|agent)\s*(?:name)?\s*[:#]\s*(.+)',
+        r'\b(badge\s*(?:no\.?|#)?\s*[:#]?\s*\d+)',
+    ],
+    'fine_amount': [
+        # "$1,250.00" with grouping commas, or "$125.00" / "$125,00" where OCR read the decimal point as a comma
+        r'(?:fine|amount due|penalty|total due|amount)\s*(?:amount)?\s*[:#]?\s*\$\s*'
+        r'(\d{1,3}(?:,\d{3})+(?:\.\d{2})?|\d{1,5}(?:[.,]\d{2})?)',
+        r'\$\s*(\d{1,3}(?:,\d{3})+\.\d{2}|\d{1,5}\.\d{2})',
+    ],
+}
+
+
+class CityTemplate:
+    """Field patterns for a known ticket layout, selected when the detection pattern matches."""
+
+    def __init__(self, city: str, detect: str, patterns: Dict[str, List[str]]):
+        self.city = city
+        self.detect = re.compile(detect, re.IGNORECASE)
+        self.patterns = {field: [re.compile(p, re.IGNORECASE | re.MULTILINE) for p in field_patterns]
+                         for field, field_patterns in patterns.items()}
+
+    def matches(self, text: str) -> bool:
+        return bool(self.detect.search(text))
+
+
+DEFAULT_TEMPLATES = [
+    CityTemplate(
+        city='New York',
+        detect=r'new york|nyc|department of finance|summons number',
+        patterns={
+            'ticket_number': [r'summons\s*(?:number|no\.?)\s*[:#]?\s*(\d{10})'],
+            'violation_code': [r'violation\s*code\s*[:#]?\s*(\d{1,2})\b'],
+            'officer_info': [r'(?:issuing agency|agency)\s*[:#]?\s*(.+)'],
+        }
+    ),
+    CityTemplate(
+        city='San Francisco',
+        detect=r'san francisco|sfmta',
+        patterns={
+            'ticket_number': [r'citation\s*(?:number|no\.?|#)\s*[:#]?\s*([A-Z0-9]{8,})'],
+            'violation_code': [r'\b(TRC\s*7\.2\.\d+[A-Z]?|V\s*C\s*\d+[A-Z]?)'],
+        }
+    ),
+    CityTemplate(
+        city='Toronto',
+        detect=r'toronto|city of toronto',
+        patterns={
+            'ticket_number': [r'(?:tag|infraction)\s*(?:number|no\.?|#)\s*[:#]?\s*([A-Z0-9]{6,})'],
+            'violation_code': [r'(?:infraction|set fine)\s*code\s*[:#]?\s*(\d{1,4})'],
+        }
+    ),
+]
+
+
+class TicketParser:
+    """Extracts ticket fields from OCR text with regular expressions, without calling an LLM."""
+
+    def __init__(self, templates: Optional[List[CityTemplate]] = None):
+        self.templates = list(DEFAULT_TEMPLATES if templates is None else templates)
+        self.generic_patterns: Dict[str, List[Pattern]] = {
+            field: [re.compile(p, re.IGNORECASE | re.MULTILINE) for p in field_patterns]
+            for field, field_patterns in GENERIC_PATTERNS.items()
+        }
+
+    def register_template(self, template: CityTemplate):
+        """Add a city template, taking precedence over the ones already registered."""
+        self.templates.insert(0, template)
+
+    def detect_template(self, text: str) -> Optional[CityTemplate]:
+        for template in self.templates:
+            if template.matches(text):
+                return template
+        return None
+
+    def parse(self, text: str) -> Dict[str, Any]:
+        """Extract every required field the patterns can find; missing fields are left out."""
+        template = self.detect_template(text)
+        # A recognized layout names its city more reliably than whatever OCR read
+        fields: Dict[str, Any] = {'city': template.city} if template else {}
+        for field in REQUIRED_TICKET_FIELDS:
+            if field in fields:
+                continue
+            patterns = list(template.patterns.get(field, [])) if template else []
+            patterns += self.generic_patterns.get(field, [])
+            value = self._first_match(patterns, text)
+            if value:
+                fields[field] = value
+
+        if 'fine_amount' in fields:
+            fields['fine_amount'] = self._normalize_amount(fields['fine_amount'])
+        return fields
+
+    @staticmethod
+    def _first_match(patterns: List[Pattern], text: str) -> Optional[str]:
+        for pattern in patterns:
+            match = pattern.search(text)
+            if match:
+                value = match.group(1).strip(' \t:#,')
+                if value:
+                    return value
+        return None
+
+    @staticmethod
+    def _normalize_amount(amount: str) -> str:
+        # OCR often reads the decimal point as a comma; any other comma groups thousands
+        if re.fullmatch(r'\d+,\d{2}', amount):
+            amount = amount.replace(',', '.')
+        else:
+            amount = amount.replace(',', '')
+        if '.' not in amount:
+            amount += '.00'
+        return f"${amount}"
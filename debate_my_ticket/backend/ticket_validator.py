@@ -1,45 +1,61 @@
-from typing import Dict, Any, List
-import json
-from litellm import completion
-import litellm
-from debate_my_ticket.utils.prompts import TICKET_VALIDATION_PROMPT
-from debate_my_ticket.utils.helpers import load_config
+from typing import Dict, Any, List, Optional
+from debate_my_ticket.utils.llm_client import LLMClient, get_llm_client
+from debate_my_ticket.utils.prompts import LEGAL_FLAWS_PROMPT
+from debate_my_ticket.utils.tracing import tracer, traced
+from debate_my_ticket.utils.ticket import Ticket, TicketLike
+from debate_my_ticket.backend.validation_rules import RuleEngine, ValidationIssue, INFO, WARNING
+
+# Replies meaning the LLM found nothing beyond the local rules
+NO_ISSUE_REPLIES = ('none', 'none.', 'no other issues', 'no other issues.', 'no issues found', 'no issues found.')
 
 class TicketValidator:
-    def __init__(self):
-        config = load_config()
-        self.api_key = config['api_key']
-        # Configure litellm to use OpenAI directly without proxies
-        litellm.set_verbose = True
-        litellm.api_key = self.api_key
+    def __init__(self, llm_client: Optional[LLMClient] = None, rule_engine: Optional[RuleEngine] = None):
+        self.llm = llm_client or get_llm_client()
+        self.rule_engine = rule_engine or RuleEngine()
     
-    def validate_ticket(self, ticket_info: Dict[str, Any]) -> List[str]:
+    def validate_ticket(self, ticket_info: TicketLike) -> List[str]:
         """Validate ticket for legal issues."""
+        return [str(issue) for issue in self.validate_ticket_detailed(ticket_info)]
+    
+    @traced("validator.validate_ticket")
+    def validate_ticket_detailed(self, ticket_info: TicketLike) -> List[ValidationIssue]:
+        """Validate ticket with the local rules, asking the LLM only about other legal flaws."""
+        issues = self.rule_engine.check(ticket_info)
+        
+        # A fatal defect already decides the validation, so the open-ended review adds nothing
+        skip_llm = any(issue.is_fatal for issue in issues)
+        tracer.current().set(rule_issues=len(issues), llm_skipped=skip_llm)
+        if skip_llm:
+            return issues
+        return issues + self._review_legal_flaws(ticket_info, issues)
+    
+    def _review_legal_flaws(self, ticket_info: TicketLike, known_issues: List[ValidationIssue]) -> List[ValidationIssue]:
+        """Ask the LLM for legal flaws that the local rules cannot judge."""
+        known = "\n".join(f"- {issue}" for issue in known_issues) or "None"
         try:
-            response = completion(
-                model="gpt-4o",
-                messages=[
+            response = self.llm.complete(
+                "validation",
+                [
                     {"role": "system", "content": "You are a legal expert specializing in ticket validation."},
-                    {"role": "user", "content": TICKET_VALIDATION_PROMPT.format(ticket_info=json.dumps(ticket_info, indent=2))}
+                    {"role": "user", "content": LEGAL_FLAWS_PROMPT.format(ticket_info=Ticket.coerce(ticket_info).canonical, known_issues=known)}
                 ],
-                api_key=self.api_key,
-                max_tokens=1000,
-                temperature=0.3,
-                timeout=30
+                max_tokens=1000
             )
             
             # Parse the response to get list of issues
-            issues = response.choices[0].message.content.split('\n')
-            return [issue.strip() for issue in issues if issue.strip()]
+            lines = [line.strip() for line in response.choices[0].message.content.split('\n')]
+            return [ValidationIssue('legal_flaw', line, WARNING, source='llm')
+                    for line in lines if line and line.lower() not in NO_ISSUE_REPLIES]
         except Exception as e:
-            return [f"Error validating ticket: {str(e)}"]
+            tracer.record_fallback(e)
+            return [ValidationIssue('llm_error', f"Error validating ticket: {str(e)}", INFO, source='llm')]
     
-    def is_ticket_valid(self, ticket_info: Dict[str, Any]) -> bool:
+    def is_ticket_valid(self, ticket_info: TicketLike) -> bool:
         """Check if ticket is legally valid."""
         issues = self.validate_ticket(ticket_info)
         return len(issues) == 0
     
-    def get_validation_summary(self, ticket_info: Dict[str, Any]) -> str:
+    def get_validation_summary(self, ticket_info: TicketLike) -> str:
         """Get a summary of ticket validation results."""
         issues = self.validate_ticket(ticket_info)
         
@@ -50,4 +66,4 @@ class TicketValidator:
         for i, issue in enumerate(issues, 1):
             summary += f"{i}. {issue}\n"
         
-        return summary 
\ No newline at end of file
+        return summary
@@ -0,0 +1,166 @@
+import re
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Callable, Optional
+
+from debate_my_ticket.utils.helpers import REQUIRED_TICKET_FIELDS
+
+FATAL = 'fatal'
+WARNING = 'warning'
+INFO = 'info'
+
+# Without these the ticket cannot be enforced at all; other missing fields are only warnings
+FATAL_MISSING_FIELDS = ('ticket_number', 'violation_code', 'date')
+
+DATE_FORMATS = ('%m/%d/%Y', '%m/%d/%y', '%Y-%m-%d', '%m-%d-%Y', '%m-%d-%y', '%d.%m.%Y',
+                '%B %d, %Y', '%b %d, %Y', '%B %d %Y', '%b %d %Y')
+TIME_FORMATS = ('', ' %I:%M %p', ' %I:%M%p', ' %H:%M', ' %H:%M:%S', 'T%H:%M', 'T%H:%M:%S', ' at %I:%M %p')
+
+# Tickets older than this are past most jurisdictions' filing or collection deadlines
+MAX_TICKET_AGE_DAYS = 3 * 365
+MAX_PLAUSIBLE_FINE = 10000
+
+_AMOUNT_PATTERN = re.compile(r'^\$?\s*(\d{1,3}(?:,\d{3})*|\d+)(?:\.(\d{2}))?$')
+_UNSIGNED_PATTERN = re.compile(r'\b(?:unsigned|not signed|no signature|signature (?:missing|absent|illegible))\b', re.IGNORECASE)
+_UNKNOWN_OFFICER_PATTERN = re.compile(r'^\s*(?:n/?a|none|unknown|illegible|-+|\?+)\s*$', re.IGNORECASE)
+
+
+class ValidationIssue:
+    """A single problem found with a ticket, by a local rule ('rules') or by the LLM ('llm')."""
+
+    def __init__(self, code: str, message: str, severity: str = WARNING, field: Optional[str] = None, source: str = 'rules'):
+        self.code = code
+        self.message = message
+        self.severity = severity
+        self.field = field
+        self.source = source
+
+    @property
+    def is_fatal(self) -> bool:
+        return self.severity == FATAL
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'code': self.code,
+            'message': self.message,
+            'severity': self.severity,
+            'field': self.field,
+            'source': self.source,
+        }
+
+    def __str__(self) -> str:
+        return self.message
+
+    def __repr__(self) -> str:
+        return f"ValidationIssue({self.code!r}, {self.message!r}, severity={self.severity!r})"
+
+
+def parse_ticket_date(value: str) -> Optional[datetime]:
+    """Parse the date (and time, when present) written on a ticket."""
+    text = ' '.join(str(value).replace(' ,', ',').split())
+    for date_format in DATE_FORMATS:
+        for time_format in TIME_FORMATS:
+            try:
+                return datetime.strptime(text, date_format + time_format)
+            except ValueError:
+                continue
+    return None
+
+
+def parse_fine_amount(value: Any) -> Optional[float]:
+    """Parse a fine like "$65", "65.00" or "$1,250.00"; None when it is not a money amount."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = _AMOUNT_PATTERN.match(str(value).strip())
+    if not match:
+        return None
+    return float(match.group(1).replace(',', '') + '.' + (match.group(2) or '00'))
+
+
+def _is_blank(value: Any) -> bool:
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def check_required_fields(ticket_info: Dict[str, Any]) -> List[ValidationIssue]:
+    issues = []
+    for field in REQUIRED_TICKET_FIELDS:
+        if _is_blank(ticket_info.get(field)):
+            label = field.replace('_', ' ')
+            severity = FATAL if field in FATAL_MISSING_FIELDS else WARNING
+            issues.append(ValidationIssue('missing_field', f"Missing required field: {label}", severity, field))
+    return issues
+
+
+def check_date(ticket_info: Dict[str, Any], now: Optional[datetime] = None) -> List[ValidationIssue]:
+    value = ticket_info.get('date')
+    if _is_blank(value):
+        return []
+    issued = parse_ticket_date(value)
+    if issued is None:
+        return [ValidationIssue('date_unparseable', f"The date \"{value}\" is not a valid date or time", WARNING, 'date')]
+    now = now or datetime.now()
+    # Allow a day of slack for time zones
+    if issued > now + timedelta(days=1):
+        return [ValidationIssue('date_in_future', f"The ticket is dated in the future ({value})", FATAL, 'date')]
+    if issued < now - timedelta(days=MAX_TICKET_AGE_DAYS):
+        return [ValidationIssue('date_too_old', f"The ticket date ({value}) is more than three years ago", WARNING, 'date')]
+    return []
+
+
+def check_fine_amount(ticket_info: Dict[str, Any]) -> List[ValidationIssue]:
+    value = ticket_info.get('fine_amount')
+    if _is_blank(value):
+        return []
+    amount = parse_fine_amount(value)
+    if amount is None:
+        return [ValidationIssue('fine_format', f"The fine amount \"{value}\" is not a valid amount", WARNING, 'fine_amount')]
+    if amount <= 0:
+        return [ValidationIssue('fine_not_positive', f"The fine amount ({value}) is not a positive amount", FATAL, 'fine_amount')]
+    if amount > MAX_PLAUSIBLE_FINE:
+        return [ValidationIssue('fine_implausible', f"The fine amount ({value}) is implausibly high", WARNING, 'fine_amount')]
+    return []
+
+
+def check_signature(ticket_info: Dict[str, Any]) -> List[ValidationIssue]:
+    officer_info = ticket_info.get('officer_info')
+    signature = ticket_info.get('signature')
+    marked_unsigned = any(isinstance(value, str) and _UNSIGNED_PATTERN.search(value) for value in (officer_info, signature))
+    if marked_unsigned or signature is False or ('signature' in ticket_info and _is_blank(signature)):
+        return [ValidationIssue('missing_signature', "The ticket is not signed by the issuing officer", FATAL, 'officer_info')]
+    if not _is_blank(officer_info) and _UNKNOWN_OFFICER_PATTERN.match(str(officer_info)):
+        return [ValidationIssue('officer_unidentified', "The issuing officer cannot be identified from the ticket", WARNING, 'officer_info')]
+    return []
+
+
+def check_ticket_number(ticket_info: Dict[str, Any]) -> List[ValidationIssue]:
+    value = ticket_info.get('ticket_number')
+    if _is_blank(value):
+        return []
+    if len(re.sub(r'[^A-Za-z0-9]', '', str(value))) < 5:
+        return [ValidationIssue('ticket_number_format', f"The ticket number \"{value}\" is too short to be valid", WARNING, 'ticket_number')]
+    return []
+
+
+DEFAULT_RULES: List[Callable[[Dict[str, Any]], List[ValidationIssue]]] = [
+    check_required_fields,
+    check_ticket_number,
+    check_date,
+    check_fine_amount,
+    check_signature,
+]
+
+
+class RuleEngine:
+    """Runs deterministic checks on extracted ticket fields, without calling an LLM."""
+
+    def __init__(self, rules: Optional[List[Callable[[Dict[str, Any]], List[ValidationIssue]]]] = None):
+        self.rules = list(DEFAULT_RULES if rules is None else rules)
+
+    def register_rule(self, rule: Callable[[Dict[str, Any]], List[ValidationIssue]]):
+        """Add a rule; it gets the ticket fields and returns the issues it finds."""
+        self.rules.append(rule)
+
+    def check(self, ticket_info: Dict[str, Any]) -> List[ValidationIssue]:
+        issues = []
+        for rule in self.rules:
+            issues.extend(rule(ticket_info))
+        return issues
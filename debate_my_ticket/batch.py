@@ -0,0 +1,169 @@
+"""Headless batch analysis of ticket images.
+
+Usage:
+    python -m debate_my_ticket.batch tickets/ -o results.jsonl --max-llm-calls 8
+    python -m debate_my_ticket.batch manifest.jsonl -o results.jsonl --trace-file spans.jsonl
+
+The input is either a directory of images or a manifest. A manifest is a text file with one
+image path per line, or a JSONL file with objects holding "path" and optionally "id" and
+"additional_context". Results are appended to the output file as they complete. Tickets already
+written with status "ok" are skipped on the next run. With --trace-file, the timing, token and
+cost span of every stage is appended there, linked to the result line by its "trace_id".
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import Dict, Any, List, Optional, Set
+
+from debate_my_ticket.backend import OCRProcessor
+from debate_my_ticket.pipeline import TicketPipeline
+from debate_my_ticket.utils.llm_client import llm_slots
+from debate_my_ticket.utils.llm_scheduler import BATCH, llm_priority
+from debate_my_ticket.utils.tracing import tracer
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+
+def load_batch_items(source: str) -> List[Dict[str, Any]]:
+    """Build the list of tickets to analyze from a directory or a manifest file."""
+    if os.path.isdir(source):
+        return [
+            {'id': name, 'path': os.path.join(source, name)}
+            for name in sorted(os.listdir(source))
+            if name.lower().endswith(IMAGE_EXTENSIONS)
+        ]
+
+    base_dir = os.path.dirname(os.path.abspath(source))
+    items = []
+    with open(source, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line) if line.startswith('{') else {'path': line}
+            if not os.path.isabs(item['path']):
+                item['path'] = os.path.join(base_dir, item['path'])
+            item.setdefault('id', item['path'])
+            items.append(item)
+    return items
+
+
+def load_completed_ids(output_path: str) -> Set[str]:
+    """Collect the ids already analyzed successfully in a previous run."""
+    completed = set()
+    if not os.path.exists(output_path):
+        return completed
+    with open(output_path, 'r') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A run interrupted mid-write can leave a truncated last line
+                continue
+            if record.get('status') == 'ok':
+                completed.add(record['id'])
+    return completed
+
+
+def _ocr_file(path: str) -> str:
+    """Read an image from disk and run OCR on it inside a worker process."""
+    with open(path, 'rb') as f:
+        return OCRProcessor.extract_text(f.read())
+
+
+class BatchRunner:
+    def __init__(self, max_llm_calls: int = 4, ocr_workers: Optional[int] = None, ticket_workers: Optional[int] = None):
+        self.max_llm_calls = max_llm_calls
+        self.ocr_workers = ocr_workers
+        # Each ticket fans out to at most two concurrent LLM calls, so more tickets than
+        # LLM slots in flight would only queue up on the semaphore
+        self.ticket_workers = ticket_workers or max_llm_calls
+        # Owned by this runner, so the cap does not throttle other users of the shared LLM client
+        self.llm_slots = threading.BoundedSemaphore(max_llm_calls)
+        # Keep only a handful of finished tickets in memory, results live in the JSONL file
+        self.pipeline = TicketPipeline(max_tickets=self.ticket_workers * 2)
+
+    def analyze_text(self, text: str, additional_context: Optional[str] = None) -> Dict[str, Any]:
+        """Run the LLM stages of the pipeline on OCR text."""
+        outputs = self.pipeline.run(('summary',), text=text, additional_context=additional_context)
+        return self.pipeline.record(outputs)
+
+    def _analyze_item(self, item: Dict[str, Any], text: str) -> Dict[str, Any]:
+        start = time.perf_counter()
+        record = {'id': item['id'], 'path': item['path']}
+        # Interactive requests from the app or the API go ahead of batch calls under the rate limits
+        with tracer.span("batch.ticket", ticket_id=item['id']) as span, llm_priority(BATCH), llm_slots(self.llm_slots):
+            record['trace_id'] = span.trace_id
+            try:
+                record.update(self.analyze_text(text, item.get('additional_context')))
+                record['status'] = 'ok'
+            except Exception as e:
+                record['status'] = 'error'
+                record['error'] = str(e)
+        record['elapsed_seconds'] = round(time.perf_counter() - start, 3)
+        return record
+
+    def run(self, items: List[Dict[str, Any]], output_path: str, resume: bool = True) -> Dict[str, int]:
+        """Analyze every item, appending one JSON line per ticket to output_path."""
+        completed = load_completed_ids(output_path) if resume else set()
+        pending = [item for item in items if item['id'] not in completed]
+        counts = {'total': len(items), 'skipped': len(items) - len(pending), 'ok': 0, 'error': 0}
+        if not pending:
+            return counts
+
+        mode = 'a' if resume else 'w'
+        with open(output_path, mode) as output, \
+                ProcessPoolExecutor(max_workers=self.ocr_workers) as ocr_pool, \
+                ThreadPoolExecutor(max_workers=self.ticket_workers) as llm_pool:
+            ocr_futures = {ocr_pool.submit(_ocr_file, item['path']): item for item in pending}
+            ticket_futures = set()
+            # One loop over both stages: a finished ticket is written right away, even while
+            # OCR is still running for others, so an interrupted run keeps what it paid for
+            while ocr_futures or ticket_futures:
+                done, _ = wait(set(ocr_futures) | ticket_futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future in ticket_futures:
+                        ticket_futures.discard(future)
+                        self._write(output, future.result(), counts)
+                        continue
+                    item = ocr_futures.pop(future)
+                    try:
+                        text = future.result()
+                    except Exception as e:
+                        self._write(output, {'id': item['id'], 'path': item['path'], 'status': 'error',
+                                             'error': f"Error processing image: {str(e)}"}, counts)
+                        continue
+                    ticket_futures.add(llm_pool.submit(self._analyze_item, item, text))
+        return counts
+
+    def _write(self, output, record: Dict[str, Any], counts: Dict[str, int]):
+        output.write(json.dumps(record) + '\n')
+        output.flush()
+        counts[record['status']] += 1
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Analyze a folder or manifest of ticket images to JSONL.")
+    parser.add_argument('source', help="Directory of ticket images or a manifest file")
+    parser.add_argument('-o', '--output', default='results.jsonl', help="JSONL file to append results to")
+    parser.add_argument('--max-llm-calls', type=int, default=4, help="Maximum number of LLM requests in flight")
+    parser.add_argument('--ocr-workers', type=int, default=None, help="Number of OCR worker processes")
+    parser.add_argument('--no-resume', action='store_true', help="Reprocess every ticket and overwrite the output")
+    parser.add_argument('--trace-file', default=None, help="JSONL file to append per-stage timing spans to")
+    args = parser.parse_args(argv)
+
+    if args.trace_file:
+        tracer.jsonl_path = args.trace_file
+
+    items = load_batch_items(args.source)
+    runner = BatchRunner(max_llm_calls=args.max_llm_calls, ocr_workers=args.ocr_workers)
+    counts = runner.run(items, args.output, resume=not args.no_resume)
+    print(f"Processed {counts['ok'] + counts['error']} tickets "
+          f"({counts['ok']} ok, {counts['error']} failed, {counts['skipped']} already done)")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,119 +1,226 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Callable, Tuple, Iterator, Optional
+from concurrent.futures import ThreadPoolExecutor
+import queue
 from debate_my_ticket.agents.pro_payment import ProPaymentAgent
 from debate_my_ticket.agents.anti_payment import AntiPaymentAgent
-from debate_my_ticket.backend.info_scraper import InfoScraper
-from debate_my_ticket.backend.ticket_validator import TicketValidator
+from debate_my_ticket.utils.llm_client import LLMClient, get_llm_client
+from debate_my_ticket.utils.prompts import DEBATE_SUMMARY_PROMPT
+from debate_my_ticket.utils.helpers import stream_with_fallback
+from debate_my_ticket.utils.tracing import tracer, traced, submit_in_context
+from debate_my_ticket.utils.round_controller import RoundController, parse_turn
+
+SUMMARY_ERROR = "Error generating summary. Please review the debate points above."
+# Enough for several full debates; keeps summary prompts and memory bounded for long sessions
+DEFAULT_MAX_HISTORY = 20
 
 
 class DebateRunner:
-    def __init__(self):
-        self.pro_agent = ProPaymentAgent()
-        self.anti_agent = AntiPaymentAgent()
-        self.info_scraper = InfoScraper()
-        self.validator = TicketValidator()
-        self.max_rounds = 3
+    def __init__(self, pro_agent: Optional[ProPaymentAgent] = None, anti_agent: Optional[AntiPaymentAgent] = None,
+                 llm_client: Optional[LLMClient] = None, max_history: int = DEFAULT_MAX_HISTORY,
+                 round_controller: Optional[RoundController] = None):
+        self.llm = llm_client or get_llm_client()
+        self.pro_agent = pro_agent or ProPaymentAgent(self.llm)
+        self.anti_agent = anti_agent or AntiPaymentAgent(self.llm)
+        self.round_controller = round_controller or RoundController()
+        self.max_history = max_history
         self.debate_history = []
+        # Why and after which round the last debate ended (see RoundController.check)
+        self.stop: Optional[Dict[str, Any]] = None
+        # Total messages ever added, used as a stable index once old messages are trimmed
+        self._message_count = 0
     
-    def _initialize_context(self, ticket_info: Dict[str, Any]) -> Dict[str, Any]:
-        """Initialize context with default values and gather information."""
-        try:
-            # Initialize with default values
-            context = {
-                'local_laws': 'No specific local laws found.',
-                'social_context': 'No social context available.'
-            }
-            
-            # Gather additional context
-            gathered_context = self.info_scraper.gather_context(ticket_info)
-            
-            # Update context with gathered information
-            if gathered_context.get('local_laws'):
-                context['local_laws'] = gathered_context['local_laws']
-            if gathered_context.get('social_context'):
-                context['social_context'] = gathered_context['social_context']
-            
-            return context
-        except Exception as e:
-            print(f"Warning: Error gathering context: {str(e)}")
-            return {
-                'local_laws': 'No specific local laws found.',
-                'social_context': 'No social context available.'
-            }
+    @property
+    def max_rounds(self) -> int:
+        return self.round_controller.max_rounds
+    
+    @max_rounds.setter
+    def max_rounds(self, value: int):
+        self.round_controller.max_rounds = value
+    
+    def reset(self):
+        """Forget the previous debate before analyzing another ticket."""
+        self.debate_history = []
+        self._message_count = 0
+        self.stop = None
     
-    def run_debate(self, ticket_info: Dict[str, Any], context: Dict[str, Any]) -> List[Dict[str, str]]:
-        """Run the debate between agents."""
+    def add_messages(self, messages: List[Dict[str, str]]):
+        """Append messages to the history, dropping the oldest ones beyond max_history."""
+        self.debate_history.extend(messages)
+        self._message_count += len(messages)
+        if len(self.debate_history) > self.max_history:
+            del self.debate_history[:len(self.debate_history) - self.max_history]
+    
+    def _record_validation(self, validation_issues: Optional[List[str]]) -> Optional[Dict[str, str]]:
+        """Add the validation issues found upstream to the history as a system message."""
+        if not validation_issues:
+            return None
+        message = {
+            'role': 'system',
+            'content': f"Ticket validation issues found: {', '.join(validation_issues)}"
+        }
+        self.add_messages([message])
+        return message
+    
+    def _run_turns(self, executor: ThreadPoolExecutor, pro_turn: Callable[[], str], anti_turn: Callable[[], str]) -> Tuple[str, str]:
+        """Run the pro and anti turns of a round concurrently and join them in a fixed order."""
+        pro_future = submit_in_context(executor, pro_turn)
+        anti_future = submit_in_context(executor, anti_turn)
+        return pro_future.result(), anti_future.result()
+    
+    @traced("debate.run")
+    def run_debate(self, ticket_info: Dict[str, Any], context: Dict[str, Any], validation_issues: Optional[List[str]] = None) -> List[Dict[str, str]]:
+        """Run the debate between agents, given the validation issues found for the ticket."""
         try:
-            # Validate ticket first
-            issues = self.validator.validate_ticket(ticket_info)
-            if issues:
-                self.debate_history.append({
-                    'role': 'system',
-                    'content': f"Ticket validation issues found: {', '.join(issues)}"
-                })
-            
-            # Get initial arguments
-            pro_argument = self.pro_agent.generate_argument(ticket_info, context)
-            anti_argument = self.anti_agent.generate_argument(ticket_info, context)
+            self.stop = None
+            self._record_validation(validation_issues)
             
-            # Add initial arguments to history
-            self.debate_history.extend([
-                {'role': 'pro_payment', 'content': pro_argument},
-                {'role': 'anti_payment', 'content': anti_argument}
-            ])
-            
-            # Run debate rounds
-            for _ in range(self.max_rounds - 1):
-                # Get responses to previous arguments
-                pro_response = self.pro_agent.respond_to_counterargument(
-                    self.debate_history[-1]['content'],
-                    ticket_info,
-                    context
-                )
-                anti_response = self.anti_agent.respond_to_counterargument(
-                    self.debate_history[-2]['content'],
-                    ticket_info,
-                    context
-                )
-                
-                # Add responses to history
-                self.debate_history.extend([
-                    {'role': 'pro_payment', 'content': pro_response},
-                    {'role': 'anti_payment', 'content': anti_response}
-                ])
+            # Each round only depends on the previous one, so both agents argue at the same time
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                previous = None
+                for round_number in range(1, self.max_rounds + 1):
+                    with tracer.span("debate.round", round=round_number) as span:
+                        if previous is None:
+                            # Get initial arguments
+                            pro_text, anti_text = self._run_turns(
+                                executor,
+                                lambda: self.pro_agent.generate_argument(ticket_info, context),
+                                lambda: self.anti_agent.generate_argument(ticket_info, context)
+                            )
+                        else:
+                            # Get responses to previous arguments
+                            pro_text, anti_text = self._run_turns(
+                                executor,
+                                lambda: self.pro_agent.respond_to_counterargument(previous['anti_payment'], ticket_info, context),
+                                lambda: self.anti_agent.respond_to_counterargument(previous['pro_payment'], ticket_info, context)
+                            )
+                        
+                        turns = {
+                            'pro_payment': parse_turn('pro_payment', pro_text),
+                            'anti_payment': parse_turn('anti_payment', anti_text)
+                        }
+                        self.add_messages([{'role': role, 'content': turn['content']} for role, turn in turns.items()])
+                        
+                        # Easy tickets end early on a concession, low confidence or repetition
+                        self.stop = self.round_controller.check(round_number, turns, previous)
+                        if self.stop:
+                            span.set(stop_reason=self.stop['reason'])
+                    if self.stop:
+                        break
+                    previous = {role: turn['content'] for role, turn in turns.items()}
             
             return self.debate_history
         except Exception as e:
             print(f"Error in debate: {str(e)}")
             return [{'role': 'error', 'content': f"Error running debate: {str(e)}"}]
     
-    def get_debate_summary(self) -> str:
-        """Get a summary of the debate using LLM."""
-        if not self.debate_history:
-            return "No debate history available."
+    def _stream_turns(self, executor: ThreadPoolExecutor, pro_turn: Callable[[], Iterator[str]], anti_turn: Callable[[], Iterator[str]]) -> Iterator[Dict[str, Any]]:
+        """Stream the pro and anti turns of a round concurrently as interleaved token events."""
+        events = queue.Queue()
+        base_index = self._message_count
+        turns = [('pro_payment', pro_turn), ('anti_payment', anti_turn)]
         
+        def pump(index: int, role: str, turn: Callable[[], Iterator[str]]):
+            parts = []
+            try:
+                for token in turn():
+                    parts.append(token)
+                    events.put({'type': 'token', 'index': index, 'role': role, 'content': token})
+            finally:
+                events.put({'type': 'message', 'index': index, 'role': role, 'content': ''.join(parts)})
+        
+        # Announce both turns first so consumers can lay them out in a fixed order
+        for offset, (role, _) in enumerate(turns):
+            yield {'type': 'start', 'index': base_index + offset, 'role': role}
+        for offset, (role, turn) in enumerate(turns):
+            submit_in_context(executor, pump, base_index + offset, role, turn)
+        
+        finished = 0
+        while finished < len(turns):
+            event = events.get()
+            if event['type'] == 'message':
+                finished += 1
+            yield event
+    
+    def stream_debate(self, ticket_info: Dict[str, Any], context: Dict[str, Any], validation_issues: Optional[List[str]] = None) -> Iterator[Dict[str, Any]]:
+        """Run the debate while yielding 'start', 'token' and 'message' events as agents produce text, then a 'stop' event."""
+        self.stop = None
+        message = self._record_validation(validation_issues)
+        if message:
+            yield {'type': 'message', 'index': self._message_count - 1, **message}
+        
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            previous = None
+            for round_number in range(1, self.max_rounds + 1):
+                if previous is None:
+                    pro_turn = lambda: self.pro_agent.stream_argument(ticket_info, context)
+                    anti_turn = lambda: self.anti_agent.stream_argument(ticket_info, context)
+                else:
+                    pro_turn = lambda: self.pro_agent.stream_counterargument(previous['anti_payment'], ticket_info, context)
+                    anti_turn = lambda: self.anti_agent.stream_counterargument(previous['pro_payment'], ticket_info, context)
+                
+                turns = {}
+                for event in self._stream_turns(executor, pro_turn, anti_turn):
+                    if event['type'] == 'message':
+                        # The final message drops the CONCEDE / CONFIDENCE markers shown while streaming
+                        turns[event['role']] = parse_turn(event['role'], event['content'])
+                        event = {**event, 'content': turns[event['role']]['content']}
+                    yield event
+                
+                self.add_messages([
+                    {'role': 'pro_payment', 'content': turns['pro_payment']['content']},
+                    {'role': 'anti_payment', 'content': turns['anti_payment']['content']}
+                ])
+                
+                self.stop = self.round_controller.check(round_number, turns, previous)
+                if self.stop:
+                    yield {'type': 'stop', **self.stop}
+                    return
+                previous = {role: turn['content'] for role, turn in turns.items()}
+    
+    def _summary_messages(self, debate_history: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        """Build the summarization request from the debate history."""
         # Prepare debate content for summarization
         debate_content = ""
-        for entry in self.debate_history:
+        for entry in debate_history:
             if entry['role'] == 'pro_payment':
                 debate_content += f"Pro-Payment Argument: {entry['content']}\n\n"
             elif entry['role'] == 'anti_payment':
                 debate_content += f"Anti-Payment Argument: {entry['content']}\n\n"
         
-        # Use LLM to generate summary
-        summary_prompt = f"""Please analyze the following debate about a ticket and provide a concise summary with:
-1. Key points from both sides
-2. The strength of each argument
-3. A clear recommendation on whether to pay or challenge the ticket
-
-Debate content:
-{debate_content}
-
-Please provide a well-structured summary that helps the user make an informed decision."""
-
+        return [
+            {"role": "system", "content": "You are an impartial legal analyst summarizing a debate about a ticket."},
+            {"role": "user", "content": DEBATE_SUMMARY_PROMPT.format(debate_content=debate_content)}
+        ]
+    
+    @traced("debate.summary")
+    def get_debate_summary(self, debate_history: Optional[List[Dict[str, str]]] = None) -> str:
+        """Get a summary of the debate (this runner's history by default) using LLM."""
+        debate_history = self.debate_history if debate_history is None else debate_history
+        if not debate_history:
+            return "No debate history available."
+        
         try:
-            # Use the pro_agent to generate summary
-            summary = self.pro_agent.generate_argument(summary_prompt, {})
-            return summary
+            response = self.llm.complete(
+                "summary",
+                self._summary_messages(debate_history),
+                max_tokens=600
+            )
+            return response.choices[0].message.content
         except Exception as e:
+            tracer.record_fallback(e)
             print(f"Error generating summary: {str(e)}")
-            return "Error generating summary. Please review the debate points above." 
\ No newline at end of file
+            return SUMMARY_ERROR
+    
+    def stream_summary(self, debate_history: Optional[List[Dict[str, str]]] = None) -> Iterator[str]:
+        """Stream the debate summary token by token."""
+        debate_history = self.debate_history if debate_history is None else debate_history
+        if not debate_history:
+            yield "No debate history available."
+            return
+        
+        tokens = self.llm.stream(
+            "summary",
+            self._summary_messages(debate_history),
+            max_tokens=600
+        )
+        yield from stream_with_fallback(tokens, SUMMARY_ERROR)
@@ -0,0 +1,324 @@
+import contextvars
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Callable, Iterable, Iterator, Optional, Tuple
+
+from debate_my_ticket.agents.pro_payment import ProPaymentAgent
+from debate_my_ticket.agents.anti_payment import AntiPaymentAgent
+from debate_my_ticket.backend import OCRProcessor, InfoScraper, TicketValidator
+from debate_my_ticket.langgraph_runner import DebateRunner
+from debate_my_ticket.utils.llm_client import LLMClient, get_llm_client
+from debate_my_ticket.utils.ticket import Ticket
+from debate_my_ticket.utils.tracing import tracer, submit_in_context
+
+
+class Stage:
+    def __init__(self, name: str, func: Callable[['TicketRun'], Any], depends_on: Tuple[str, ...] = ()):
+        self.name = name
+        self.func = func
+        self.depends_on = depends_on
+
+
+class TicketRun:
+    """Inputs and memoized stage outputs for a single ticket."""
+
+    def __init__(self, key: str, image_data: Optional[bytes], text: Optional[str], additional_context: Optional[str]):
+        self.key = key
+        self.image_data = image_data
+        self.text = text
+        self.additional_context = additional_context
+        self.outputs: Dict[str, Any] = {}
+        # Streamed stages ('debate', 'summary') still being produced; later callers follow these
+        self.streams: Dict[str, 'StageStream'] = {}
+        self.lock = threading.Lock()
+
+
+class StageStream:
+    """Events of a stage being streamed, buffered so any number of callers can follow it from the start."""
+
+    def __init__(self):
+        self.items: List[Any] = []
+        self.done = False
+        self.error: Optional[Exception] = None
+        self._cond = threading.Condition()
+
+    def append(self, item: Any):
+        with self._cond:
+            self.items.append(item)
+            self._cond.notify_all()
+
+    def finish(self, error: Optional[Exception] = None):
+        with self._cond:
+            self.done = True
+            self.error = error
+            self._cond.notify_all()
+
+    def follow(self) -> Iterator[Any]:
+        """Yield every event so far and then each new one until the stage ends, re-raising its error."""
+        index = 0
+        while True:
+            with self._cond:
+                while index >= len(self.items) and not self.done:
+                    self._cond.wait()
+                pending = self.items[index:]
+                index += len(pending)
+                done, error = self.done, self.error
+            yield from pending
+            if done:
+                if error is not None:
+                    raise error
+                return
+
+    def wait(self):
+        with self._cond:
+            while not self.done:
+                self._cond.wait()
+
+
+class TicketPipeline:
+    """Runs the ticket stages (extract -> {context, validation} -> debate -> summary) once each per ticket."""
+
+    def __init__(self,
+                 ocr_processor: Optional[OCRProcessor] = None,
+                 info_scraper: Optional[InfoScraper] = None,
+                 validator: Optional[TicketValidator] = None,
+                 pro_agent: Optional[ProPaymentAgent] = None,
+                 anti_agent: Optional[AntiPaymentAgent] = None,
+                 llm_client: Optional[LLMClient] = None,
+                 max_tickets: int = 64):
+        self.llm = llm_client or get_llm_client()
+        self.ocr_processor = ocr_processor or OCRProcessor(llm_client=self.llm)
+        self.info_scraper = info_scraper or InfoScraper(llm_client=self.llm)
+        self.validator = validator or TicketValidator(llm_client=self.llm)
+        self.pro_agent = pro_agent or ProPaymentAgent(self.llm)
+        self.anti_agent = anti_agent or AntiPaymentAgent(self.llm)
+        self.max_tickets = max_tickets
+        self.stages = {
+            'extract': Stage('extract', self._extract),
+            'context': Stage('context', self._gather_context, ('extract',)),
+            'validation': Stage('validation', self._validate, ('extract',)),
+            'debate': Stage('debate', self._debate, ('extract', 'context', 'validation')),
+            'summary': Stage('summary', self._summarize, ('debate',)),
+        }
+        self._runs: 'OrderedDict[str, TicketRun]' = OrderedDict()
+        self._runs_lock = threading.Lock()
+
+    @staticmethod
+    def ticket_key(image_data: Optional[bytes] = None, text: Optional[str] = None, additional_context: Optional[str] = None) -> str:
+        """Identify a ticket by its raw input and the user supplied context."""
+        digest = hashlib.sha256()
+        if image_data is not None:
+            digest.update(b'image:' + image_data)
+        else:
+            digest.update(b'text:' + (text or '').encode('utf-8'))
+        digest.update(b'\0context:' + (additional_context or '').encode('utf-8'))
+        return digest.hexdigest()
+
+    def get_run(self, image_data: Optional[bytes] = None, text: Optional[str] = None, additional_context: Optional[str] = None) -> TicketRun:
+        """Get the memoized run for a ticket, creating it on first use."""
+        if image_data is None and text is None:
+            raise ValueError("Either image_data or text is required")
+        key = self.ticket_key(image_data, text, additional_context)
+        with self._runs_lock:
+            run = self._runs.get(key)
+            if run is None:
+                run = TicketRun(key, image_data, text, additional_context)
+                self._runs[key] = run
+                while len(self._runs) > self.max_tickets:
+                    self._runs.popitem(last=False)
+            self._runs.move_to_end(key)
+            return run
+
+    def run(self, targets: Iterable[str] = ('summary',), image_data: Optional[bytes] = None,
+            text: Optional[str] = None, additional_context: Optional[str] = None) -> Dict[str, Any]:
+        """Run the stages needed for the targets and return every stage output computed so far."""
+        run = self.get_run(image_data, text, additional_context)
+        self.execute(run, targets)
+        with run.lock:
+            return dict(run.outputs)
+
+    def execute(self, run: TicketRun, targets: Iterable[str]):
+        """Compute the missing stages for the targets, running independent stages concurrently."""
+        while True:
+            with run.lock:
+                waves = self._plan(targets, run.outputs)
+                streaming = [run.streams[name] for wave in waves for name in wave if name in run.streams]
+                if not streaming:
+                    self._run_waves(run, waves)
+                    return
+            # A stage another caller is streaming is not computed a second time: wait for it, then re-plan
+            for stream in streaming:
+                stream.wait()
+
+    def _run_waves(self, run: TicketRun, waves: List[List[str]]):
+        for wave in waves:
+            if len(wave) == 1:
+                run.outputs[wave[0]] = self._run_stage(wave[0], run)
+                continue
+            with ThreadPoolExecutor(max_workers=len(wave)) as executor:
+                futures = {name: submit_in_context(executor, self._run_stage, name, run) for name in wave}
+                for name, future in futures.items():
+                    run.outputs[name] = future.result()
+
+    def _run_stage(self, name: str, run: TicketRun) -> Any:
+        with tracer.span(f"pipeline.{name}", ticket=run.key[:12]):
+            return self.stages[name].func(run)
+
+    def _plan(self, targets: Iterable[str], done: Dict[str, Any]) -> List[List[str]]:
+        """Group the missing stages into waves whose dependencies are all satisfied by earlier waves."""
+        needed = set()
+        pending = list(targets)
+        while pending:
+            name = pending.pop()
+            if name not in self.stages:
+                raise ValueError(f"Unknown pipeline stage: {name}")
+            if name in done or name in needed:
+                continue
+            needed.add(name)
+            pending.extend(self.stages[name].depends_on)
+
+        waves = []
+        finished = set(done)
+        while needed:
+            # Keep declaration order inside a wave so results are deterministic
+            wave = [name for name in self.stages if name in needed
+                    and all(dep in finished for dep in self.stages[name].depends_on)]
+            waves.append(wave)
+            finished.update(wave)
+            needed.difference_update(wave)
+        return waves
+
+    def stream_debate(self, run: TicketRun, runner: Optional[DebateRunner] = None) -> Iterator[Dict[str, Any]]:
+        """Stream the debate for a ticket into runner (a fresh one by default).
+
+        The debate runs once per ticket: a caller arriving while it streams follows the same events
+        from the start, and one arriving after it finished gets the messages replayed.
+        """
+        runner = runner or self.new_runner()
+        runner.reset()
+        stream, leader = self._join_stream(run, 'debate')
+        if leader:
+            def produce() -> Iterator[Dict[str, Any]]:
+                self.execute(run, ('extract', 'context', 'validation'))
+                yield from runner.stream_debate(run.outputs['extract'], run.outputs['context'], run.outputs['validation'])
+            self._start_stream(run, 'debate', stream, produce,
+                               lambda: {'debate_stop': runner.stop, 'debate': list(runner.debate_history)})
+            yield from stream.follow()
+            return
+
+        if stream is not None:
+            yield from stream.follow()
+        with run.lock:
+            debate, debate_stop = run.outputs['debate'], run.outputs.get('debate_stop')
+        runner.add_messages(debate)
+        runner.stop = debate_stop
+        if stream is None:
+            for index, message in enumerate(debate):
+                yield {'type': 'message', 'index': index, **message}
+            if debate_stop:
+                yield {'type': 'stop', **debate_stop}
+
+    def stream_summary(self, run: TicketRun, runner: Optional[DebateRunner] = None) -> Iterator[str]:
+        """Stream the summary for a ticket, following or replaying it if another caller already started it."""
+        stream, leader = self._join_stream(run, 'summary')
+        if stream is None:
+            with run.lock:
+                summary = run.outputs['summary']
+            yield summary
+            return
+
+        if leader:
+            runner = runner or self.new_runner()
+            parts = []
+
+            def produce() -> Iterator[str]:
+                self.execute(run, ('debate',))
+                for token in runner.stream_summary(run.outputs['debate']):
+                    parts.append(token)
+                    yield token
+            self._start_stream(run, 'summary', stream, produce, lambda: {'summary': ''.join(parts)})
+        yield from stream.follow()
+
+    @staticmethod
+    def _join_stream(run: TicketRun, name: str) -> Tuple[Optional[StageStream], bool]:
+        """Get (stream, leader) for a streamed stage: (None, False) when its output already exists."""
+        with run.lock:
+            if name in run.outputs:
+                return None, False
+            stream = run.streams.get(name)
+            if stream is not None:
+                return stream, False
+            stream = run.streams[name] = StageStream()
+            return stream, True
+
+    @staticmethod
+    def _start_stream(run: TicketRun, name: str, stream: StageStream, produce: Callable[[], Iterable[Any]],
+                      outputs: Callable[[], Dict[str, Any]]):
+        """Produce a streamed stage in the background, so it completes even if the caller stops reading."""
+        def work():
+            error = None
+            try:
+                for item in produce():
+                    stream.append(item)
+            except Exception as e:
+                error = e
+            finally:
+                # Store the outputs and retire the stream together, so callers see one or the other
+                with run.lock:
+                    if error is None:
+                        run.outputs.update(outputs())
+                    run.streams.pop(name, None)
+                stream.finish(error)
+
+        context = contextvars.copy_context()
+        threading.Thread(target=context.run, args=(work,), name=f"stream-{name}", daemon=True).start()
+
+    @staticmethod
+    def record(outputs: Dict[str, Any]) -> Dict[str, Any]:
+        """Collect the outputs of a finished ticket into a flat, JSON serializable record."""
+        return {
+            'ticket_info': Ticket.coerce(outputs['extract']).to_dict(),
+            'field_sources': outputs.get('field_sources'),
+            'context': outputs['context'],
+            'validation_issues': outputs['validation'],
+            'validation_details': outputs.get('validation_details'),
+            'debate': outputs['debate'],
+            'debate_stop': outputs.get('debate_stop'),
+            'summary': outputs['summary']
+        }
+
+    def new_runner(self) -> DebateRunner:
+        """Create a debate runner with its own history that shares this pipeline's agents."""
+        return DebateRunner(pro_agent=self.pro_agent, anti_agent=self.anti_agent, llm_client=self.llm)
+
+    def _extract(self, run: TicketRun) -> Ticket:
+        if run.text is not None:
+            ticket_info, field_sources = self.ocr_processor.process_text_with_sources(run.text)
+        else:
+            ticket_info, field_sources = self.ocr_processor.process_image_with_sources(run.image_data)
+        # Side output: which path ('parser' or 'llm') produced each field
+        run.outputs['field_sources'] = field_sources
+        if run.additional_context:
+            ticket_info['additional_context'] = run.additional_context
+        return ticket_info
+
+    def _gather_context(self, run: TicketRun) -> Dict[str, Any]:
+        return self.info_scraper.gather_context(run.outputs['extract'])
+
+    def _validate(self, run: TicketRun) -> List[str]:
+        issues = self.validator.validate_ticket_detailed(run.outputs['extract'])
+        # Side output: the structured issues behind the messages
+        run.outputs['validation_details'] = [issue.to_dict() for issue in issues]
+        return [str(issue) for issue in issues]
+
+    def _debate(self, run: TicketRun) -> List[Dict[str, str]]:
+        runner = self.new_runner()
+        debate = runner.run_debate(run.outputs['extract'], run.outputs['context'], run.outputs['validation'])
+        # Side output: why and after which round the debate ended
+        run.outputs['debate_stop'] = runner.stop
+        return debate
+
+    def _summarize(self, run: TicketRun) -> str:
+        return self.new_runner().get_debate_summary(run.outputs['debate'])
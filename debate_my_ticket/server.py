@@ -0,0 +1,372 @@
+"""Headless HTTP API for the ticket pipeline.
+
+Usage:
+    python -m debate_my_ticket.server --port 8080 --workers 4 --queue-size 64
+
+Endpoints:
+    POST /jobs                 submit a ticket, as JSON {"text"|"image_base64", "additional_context"}
+                               or as a raw image body (additional_context in the query string)
+    GET  /jobs/<id>            job status and progress
+    GET  /jobs/<id>/result     the analysis record once the job is done
+    GET  /jobs/<id>/events     server-sent progress events (stage, message, stop, done, error)
+    GET  /health               queue depth and worker usage
+
+Jobs run on a fixed pool of worker threads fed by a bounded queue. When the queue is full,
+submissions get 429 with Retry-After. When too many connections are open, requests get 503
+instead of another thread.
+"""
+import argparse
+import base64
+import json
+import queue
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, List, Optional
+from urllib.parse import urlparse, parse_qs
+
+from debate_my_ticket.backend import get_history_store
+from debate_my_ticket.pipeline import TicketPipeline
+from debate_my_ticket.utils.llm_client import get_llm_client
+from debate_my_ticket.utils.tracing import tracer
+
+MAX_BODY_BYTES = 10 * 1024 * 1024
+HEARTBEAT_SECONDS = 15
+
+
+class Job:
+    def __init__(self, image_data: Optional[bytes], text: Optional[str], additional_context: Optional[str]):
+        self.id = uuid.uuid4().hex
+        self.image_data = image_data
+        self.text = text
+        self.additional_context = additional_context
+        self.status = 'queued'
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.events: List[Dict[str, Any]] = []
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.changed = threading.Condition()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ('done', 'error')
+
+    def emit(self, event: Dict[str, Any]):
+        with self.changed:
+            self.events.append(event)
+            self.changed.notify_all()
+
+    def finish(self, status: str, event: Dict[str, Any]):
+        """Record the final status together with its event so event streams never miss either."""
+        with self.changed:
+            self.status = status
+            self.finished_at = time.time()
+            self.events.append(event)
+            self.changed.notify_all()
+
+    def to_dict(self) -> Dict[str, Any]:
+        stages = [event['stage'] for event in self.events if event['type'] == 'stage']
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'completed_stages': stages,
+            'events': len(self.events),
+            'error': self.error,
+        }
+
+
+class JobQueue:
+    """Bounded queue of ticket jobs processed by a fixed pool of worker threads."""
+
+    def __init__(self, pipeline: Optional[TicketPipeline] = None, workers: int = 4, queue_size: int = 64,
+                 max_jobs: int = 1000, save_history: bool = True):
+        self.pipeline = pipeline or TicketPipeline(max_tickets=workers * 2)
+        self.workers = workers
+        self.save_history = save_history
+        # Finished jobs are kept for polling until max_jobs newer ones push them out
+        self.max_jobs = max_jobs
+        self._queue: 'queue.Queue[Job]' = queue.Queue(maxsize=queue_size)
+        self._jobs: 'OrderedDict[str, Job]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._busy = 0
+        self._threads = [threading.Thread(target=self._work, daemon=True, name=f"ticket-worker-{i}") for i in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, image_data: Optional[bytes] = None, text: Optional[str] = None,
+               additional_context: Optional[str] = None) -> Optional[Job]:
+        """Queue a ticket, or return None when the queue is full."""
+        job = Job(image_data, text, additional_context)
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            return None
+        with self._lock:
+            self._jobs[job.id] = job
+            self._evict()
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'queued': self._queue.qsize(),
+                'queue_size': self._queue.maxsize,
+                'workers': self.workers,
+                'busy_workers': self._busy,
+                'jobs': len(self._jobs),
+                'llm_coalescing': self.pipeline.llm.get_stats()['coalescing'],
+                'llm_scheduler': self.pipeline.llm.scheduler.get_stats(),
+                'llm_routing': self.pipeline.llm.router.get_stats(),
+            }
+
+    def _evict(self):
+        # Only drop finished jobs, oldest first; queued and running ones are still needed
+        excess = len(self._jobs) - self.max_jobs
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.finished][:max(excess, 0)]:
+            del self._jobs[job_id]
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            with self._lock:
+                self._busy += 1
+            try:
+                self._run(job)
+            finally:
+                with self._lock:
+                    self._busy -= 1
+                    self._evict()
+                self._queue.task_done()
+
+    def _run(self, job: Job):
+        job.status = 'running'
+        job.started_at = time.time()
+        with tracer.span("server.job", job_id=job.id) as span:
+            try:
+                pipeline = self.pipeline
+                run = pipeline.get_run(image_data=job.image_data, text=job.text, additional_context=job.additional_context)
+                pipeline.execute(run, ('extract',))
+                job.emit({'type': 'stage', 'stage': 'extract', 'ticket_info': run.outputs['extract'].to_dict()})
+                pipeline.execute(run, ('context', 'validation'))
+                job.emit({'type': 'stage', 'stage': 'context'})
+                job.emit({'type': 'stage', 'stage': 'validation', 'issues': run.outputs['validation']})
+
+                for event in pipeline.stream_debate(run):
+                    if event['type'] in ('message', 'stop'):
+                        job.emit(event)
+                job.emit({'type': 'stage', 'stage': 'debate'})
+                pipeline.execute(run, ('summary',))
+                job.emit({'type': 'stage', 'stage': 'summary', 'summary': run.outputs['summary']})
+
+                job.result = pipeline.record(run.outputs)
+                job.result['ticket_number'] = job.result['ticket_info'].get('ticket_number') or run.key[:16]
+                if self.save_history:
+                    get_history_store().save(job.result)
+                job.finish('done', {'type': 'done'})
+            except Exception as e:
+                span.error = f"{type(e).__name__}: {str(e)}"
+                job.error = str(e)
+                job.finish('error', {'type': 'error', 'error': job.error})
+            finally:
+                # Finished jobs are kept for polling; drop the upload whatever the outcome
+                job.image_data = job.text = None
+
+
+class ServiceHTTPServer(ThreadingHTTPServer):
+    """Threading server that turns connections away with 503 instead of starting unbounded threads."""
+
+    daemon_threads = True
+
+    def __init__(self, address, handler, jobs: JobQueue, max_connections: int = 128):
+        super().__init__(address, handler)
+        self.jobs = jobs
+        self._connections = threading.BoundedSemaphore(max_connections)
+
+    def process_request(self, request, client_address):
+        if not self._connections.acquire(blocking=False):
+            try:
+                request.sendall(b"HTTP/1.1 503 Service Unavailable\r\nRetry-After: 1\r\n"
+                                b"Content-Length: 0\r\nConnection: close\r\n\r\n")
+            finally:
+                self.shutdown_request(request)
+            return
+        super().process_request(request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        try:
+            super().process_request_thread(request, client_address)
+        finally:
+            self._connections.release()
+
+
+class TicketAPIHandler(BaseHTTPRequestHandler):
+    server: ServiceHTTPServer
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path.rstrip('/') != '/jobs':
+            self._send_json(404, {'error': 'Not found'})
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+        except ValueError:
+            length = -1
+        if length < 0:
+            # Without a usable length the body cannot be skipped, so the connection is not reused
+            self._send_json(400, {'error': 'Content-Length must be a non-negative integer'}, {'Connection': 'close'})
+            return
+        if length > MAX_BODY_BYTES:
+            self._send_json(413, {'error': f"Request body is larger than {MAX_BODY_BYTES} bytes"})
+            return
+        body = self.rfile.read(length)
+
+        try:
+            image_data, text, additional_context = self._parse_submission(body, parse_qs(url.query))
+        except ValueError as e:
+            self._send_json(400, {'error': str(e)})
+            return
+
+        job = self.server.jobs.submit(image_data, text, additional_context)
+        if job is None:
+            self._send_json(429, {'error': 'Too many queued tickets, retry later'}, {'Retry-After': '5'})
+            return
+        self._send_json(202, {**job.to_dict(), 'links': self._links(job)}, {'Location': f"/jobs/{job.id}"})
+
+    def do_GET(self):
+        path = urlparse(self.path).path.rstrip('/')
+        if path == '/health':
+            self._send_json(200, {'status': 'ok', **self.server.jobs.get_stats()})
+            return
+        match = re.fullmatch(r'/jobs/([0-9a-f]{32})(/result|/events)?', path)
+        job = self.server.jobs.get(match.group(1)) if match else None
+        if job is None:
+            self._send_json(404, {'error': 'Unknown job'})
+            return
+
+        if match.group(2) == '/events':
+            self._stream_events(job)
+        elif match.group(2) == '/result':
+            if job.status == 'done':
+                self._send_json(200, job.result)
+            elif job.status == 'error':
+                self._send_json(500, {'job_id': job.id, 'status': job.status, 'error': job.error})
+            else:
+                self._send_json(202, {'job_id': job.id, 'status': job.status}, {'Retry-After': '1'})
+        else:
+            self._send_json(200, {**job.to_dict(), 'links': self._links(job)})
+
+    def _parse_submission(self, body: bytes, query: Dict[str, List[str]]):
+        additional_context = query.get('additional_context', [None])[0]
+        if self.headers.get('Content-Type', '').startswith('image/'):
+            if not body:
+                raise ValueError("Empty image body")
+            return body, None, additional_context
+        try:
+            payload = json.loads(body or b'{}')
+        except ValueError:
+            raise ValueError("Body must be JSON or an image")
+        if not isinstance(payload, dict):
+            raise ValueError("JSON body must be an object")
+        additional_context = payload.get('additional_context', additional_context)
+        if payload.get('image_base64'):
+            try:
+                return base64.b64decode(payload['image_base64'], validate=True), None, additional_context
+            except ValueError:
+                raise ValueError("image_base64 is not valid base64")
+        if payload.get('text'):
+            return None, str(payload['text']), additional_context
+        raise ValueError("Provide 'text' or 'image_base64'")
+
+    def _stream_events(self, job: Job):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+
+        # Resume after the last event the client saw when it reconnects
+        try:
+            position = int(self.headers.get('Last-Event-ID', -1)) + 1
+        except ValueError:
+            position = 0
+        try:
+            while True:
+                with job.changed:
+                    if position >= len(job.events) and not job.finished:
+                        job.changed.wait(HEARTBEAT_SECONDS)
+                    pending = job.events[position:]
+                    finished = job.finished
+                if not pending:
+                    if finished:
+                        return
+                    self.wfile.write(b': keep-alive\n\n')
+                for event in pending:
+                    data = json.dumps(event, default=str)
+                    self.wfile.write(f"id: {position}\nevent: {event['type']}\ndata: {data}\n\n".encode('utf-8'))
+                    position += 1
+                self.wfile.flush()
+                if finished and position >= len(job.events):
+                    return
+        except (BrokenPipeError, ConnectionResetError):
+            # The client went away; the job keeps running
+            return
+
+    @staticmethod
+    def _links(job: Job) -> Dict[str, str]:
+        return {
+            'status': f"/jobs/{job.id}",
+            'result': f"/jobs/{job.id}/result",
+            'events': f"/jobs/{job.id}/events",
+        }
+
+    def _send_json(self, status: int, payload: Any, headers: Optional[Dict[str, str]] = None):
+        body = json.dumps(payload, default=str).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Serve the ticket pipeline over HTTP.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--workers', type=int, default=4, help="Tickets processed at the same time")
+    parser.add_argument('--queue-size', type=int, default=64, help="Tickets waiting before submissions get 429")
+    parser.add_argument('--max-connections', type=int, default=128, help="Open connections before requests get 503")
+    parser.add_argument('--max-llm-calls', type=int, default=None, help="Maximum number of LLM requests in flight")
+    parser.add_argument('--no-history', action='store_true', help="Do not save results to the history store")
+    args = parser.parse_args(argv)
+
+    if args.max_llm_calls:
+        get_llm_client().set_max_in_flight(args.max_llm_calls)
+    jobs = JobQueue(workers=args.workers, queue_size=args.queue_size, save_history=not args.no_history)
+    server = ServiceHTTPServer((args.host, args.port), TicketAPIHandler, jobs, args.max_connections)
+    print(f"Serving the ticket API on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
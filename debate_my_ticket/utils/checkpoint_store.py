@@ -0,0 +1,253 @@
+"""SQLite checkpointer for the LangGraph debate workflow.
+
+Saves the graph state after every node, so an interrupted debate resumes from its last
+completed node instead of paying again for the vision call and the turns already taken.
+
+Inspect and clean up stored debates:
+    python -m debate_my_ticket.utils.checkpoint_store threads
+    python -m debate_my_ticket.utils.checkpoint_store delete <thread_id>
+    python -m debate_my_ticket.utils.checkpoint_store prune --older-than-days 7
+"""
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Any, List, Iterator, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.serde.types import TASKS
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'checkpoints.db')
+
+
+class SqliteCheckpointSaver(BaseCheckpointSaver):
+    """Stores LangGraph checkpoints and pending node writes in a local SQLite file, keyed by thread ID."""
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, **kwargs):
+        super().__init__(**kwargs)
+        self.db_path = db_path
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            # Checkpoint IDs are time-ordered, so the newest checkpoint sorts last
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS checkpoints ("
+                "thread_id TEXT NOT NULL, checkpoint_ns TEXT NOT NULL, checkpoint_id TEXT NOT NULL, "
+                "parent_checkpoint_id TEXT, checkpoint_type TEXT, checkpoint BLOB, "
+                "metadata_type TEXT, metadata BLOB, created_at REAL NOT NULL, "
+                "PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id))"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS writes ("
+                "thread_id TEXT NOT NULL, checkpoint_ns TEXT NOT NULL, checkpoint_id TEXT NOT NULL, "
+                "task_id TEXT NOT NULL, idx INTEGER NOT NULL, channel TEXT NOT NULL, "
+                "value_type TEXT, value BLOB, task_path TEXT, "
+                "PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx))"
+            )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        """Get the checkpoint named in the config, or the latest one for its thread."""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = get_checkpoint_id(config)
+        with self._lock:
+            if checkpoint_id:
+                row = self._conn.execute(
+                    "SELECT * FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (thread_id, checkpoint_ns, checkpoint_id)
+                ).fetchone()
+            else:
+                row = self._conn.execute(
+                    "SELECT * FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                    "ORDER BY checkpoint_id DESC LIMIT 1",
+                    (thread_id, checkpoint_ns)
+                ).fetchone()
+            return self._to_tuple(row) if row else None
+
+    def list(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None,
+             before: Optional[RunnableConfig] = None, limit: Optional[int] = None) -> Iterator[CheckpointTuple]:
+        """List checkpoints newest first, optionally for one thread, before a checkpoint or matching metadata."""
+        clauses, params = [], []
+        if config:
+            clauses.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            if config["configurable"].get("checkpoint_ns") is not None:
+                clauses.append("checkpoint_ns = ?")
+                params.append(config["configurable"]["checkpoint_ns"])
+            if get_checkpoint_id(config):
+                clauses.append("checkpoint_id = ?")
+                params.append(get_checkpoint_id(config))
+        if before and get_checkpoint_id(before):
+            clauses.append("checkpoint_id < ?")
+            params.append(get_checkpoint_id(before))
+        where = " WHERE " + " AND ".join(clauses) if clauses else ""
+        with self._lock:
+            rows = self._conn.execute(f"SELECT * FROM checkpoints{where} ORDER BY checkpoint_id DESC", params).fetchall()
+            tuples = []
+            for row in rows:
+                if limit is not None and len(tuples) >= limit:
+                    break
+                checkpoint_tuple = self._to_tuple(row)
+                # Metadata is stored serialized, so filter after loading it
+                if filter and not all(checkpoint_tuple.metadata.get(key) == value for key, value in filter.items()):
+                    continue
+                tuples.append(checkpoint_tuple)
+        yield from tuples
+
+    def put(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+            new_versions: ChannelVersions) -> RunnableConfig:
+        """Save a checkpoint (with its full channel values) as a child of the checkpoint in the config."""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        stored = checkpoint.copy()
+        # Rebuilt from the parent's TASKS writes when loading
+        stored.pop("pending_sends", None)
+        checkpoint_type, checkpoint_blob = self.serde.dumps_typed(stored)
+        metadata_type, metadata_blob = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (thread_id, checkpoint_ns, checkpoint["id"], config["configurable"].get("checkpoint_id"),
+                 checkpoint_type, checkpoint_blob, metadata_type, metadata_blob, time.time())
+            )
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def put_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str,
+                   task_path: str = "") -> None:
+        """Save the writes of a finished node, so a resumed run does not execute it again."""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        rows = []
+        for index, (channel, value) in enumerate(writes):
+            value_type, value_blob = self.serde.dumps_typed(value)
+            rows.append((thread_id, checkpoint_ns, checkpoint_id, task_id, WRITES_IDX_MAP.get(channel, index),
+                         channel, value_type, value_blob, task_path))
+        # Special writes (errors, interrupts) overwrite; regular ones are written once per task
+        with self._lock, self._conn:
+            for row in rows:
+                verb = "INSERT OR REPLACE" if row[4] < 0 else "INSERT OR IGNORE"
+                self._conn.execute(f"{verb} INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", row)
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,))
+            self._conn.execute("DELETE FROM writes WHERE thread_id = ?", (thread_id,))
+
+    def threads(self) -> List[Dict[str, Any]]:
+        """Summarize the stored threads, most recently updated first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT thread_id, COUNT(*), MAX(created_at) FROM checkpoints "
+                "GROUP BY thread_id ORDER BY MAX(created_at) DESC"
+            ).fetchall()
+        return [{'thread_id': thread_id, 'checkpoints': count, 'updated_at': updated_at}
+                for thread_id, count, updated_at in rows]
+
+    def prune(self, older_than_seconds: float) -> int:
+        """Delete threads whose last checkpoint is older than the given age; returns how many were deleted."""
+        cutoff = time.time() - older_than_seconds
+        with self._lock:
+            thread_ids = [row[0] for row in self._conn.execute(
+                "SELECT thread_id FROM checkpoints GROUP BY thread_id HAVING MAX(created_at) < ?", (cutoff,)
+            ).fetchall()]
+        for thread_id in thread_ids:
+            self.delete_thread(thread_id)
+        return len(thread_ids)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _to_tuple(self, row: Tuple) -> CheckpointTuple:
+        # Called with the lock held
+        (thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id,
+         checkpoint_type, checkpoint_blob, metadata_type, metadata_blob, _) = row
+        writes = self._conn.execute(
+            "SELECT task_id, channel, value_type, value FROM writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_id, idx",
+            (thread_id, checkpoint_ns, checkpoint_id)
+        ).fetchall()
+        sends = []
+        if parent_checkpoint_id:
+            sends = self._conn.execute(
+                "SELECT value_type, value FROM writes "
+                "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? AND channel = ? "
+                "ORDER BY task_path, task_id, idx",
+                (thread_id, checkpoint_ns, parent_checkpoint_id, TASKS)
+            ).fetchall()
+        checkpoint = self.serde.loads_typed((checkpoint_type, checkpoint_blob))
+        return CheckpointTuple(
+            config={"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns,
+                                     "checkpoint_id": checkpoint_id}},
+            checkpoint={**checkpoint, "pending_sends": [self.serde.loads_typed(send) for send in sends]},
+            metadata=self.serde.loads_typed((metadata_type, metadata_blob)),
+            parent_config=(
+                {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns,
+                                  "checkpoint_id": parent_checkpoint_id}}
+                if parent_checkpoint_id else None
+            ),
+            pending_writes=[(task_id, channel, self.serde.loads_typed((value_type, value)))
+                            for task_id, channel, value_type, value in writes],
+        )
+
+
+_default_saver: Optional[SqliteCheckpointSaver] = None
+_default_saver_lock = threading.Lock()
+
+
+def get_checkpoint_saver() -> SqliteCheckpointSaver:
+    """Get the process-wide checkpoint store."""
+    global _default_saver
+    with _default_saver_lock:
+        if _default_saver is None:
+            _default_saver = SqliteCheckpointSaver()
+        return _default_saver
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Manage saved debate workflow checkpoints.")
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help="Path to the SQLite store")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('threads', help="List stored debate threads")
+    delete = subparsers.add_parser('delete', help="Delete the checkpoints of one thread")
+    delete.add_argument('thread_id')
+    prune = subparsers.add_parser('prune', help="Delete threads that have not been updated recently")
+    prune.add_argument('--older-than-days', type=float, default=7)
+    args = parser.parse_args(argv)
+
+    saver = SqliteCheckpointSaver(args.db)
+    if args.command == 'threads':
+        for thread in saver.threads():
+            print(json.dumps(thread))
+    elif args.command == 'delete':
+        saver.delete_thread(args.thread_id)
+        print(f"Deleted thread {args.thread_id}")
+    else:
+        print(f"Deleted {saver.prune(args.older_than_days * 24 * 3600)} threads")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+import json
+import time
+from typing import Dict, Any, List, Callable, Optional, Tuple
+
+try:
+    import tiktoken
+    _encoding = tiktoken.encoding_for_model("gpt-4o")
+except Exception:  # tiktoken missing or without the gpt-4o encoding
+    _encoding = None
+
+
+def count_tokens(text: str) -> int:
+    """Count prompt tokens, falling back to a ~4 characters per token estimate."""
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return (len(text) + 3) // 4
+
+
+def format_turns(messages: List[Dict[str, str]]) -> str:
+    return "\n\n".join(f"{msg['role']}: {msg['content']}" for msg in messages)
+
+
+class DebateContextManager:
+    """Keeps the recent turns verbatim and folds older ones, a batch at a time, into a rolling summary."""
+
+    def __init__(self,
+                 summarize: Callable[[str, List[Dict[str, str]]], Tuple[str, int]],
+                 keep_last: int = 4,
+                 fold_batch: int = 4,
+                 token_budget: int = 1200,
+                 count: Callable[[str], int] = count_tokens):
+        # summarize(previous_summary, new_turns) -> (updated summary, tokens the call used)
+        self.summarize = summarize
+        self.keep_last = keep_last
+        # Each fold is an extra sequential LLM call, so wait until this many turns have left the
+        # verbatim window and fold them together
+        self.fold_batch = fold_batch
+        self.token_budget = token_budget
+        self.count = count
+
+    def render(self, state: Dict[str, Any]) -> str:
+        """Build the debate context for the next turn, updating the rolling summary stored in state."""
+        messages = state["messages"]
+        spent = {"tokens": 0, "seconds": 0.0}
+
+        if len(messages) - self.keep_last - state.get("summarized_turns", 0) >= self.fold_batch:
+            self._fold(state, len(messages) - self.keep_last, spent)
+        context = self._compose(state.get("summary", ""), messages[state.get("summarized_turns", 0):])
+
+        # Over budget: fold down to the verbatim window, then if need be down to the last turn (two calls at most)
+        for until in (len(messages) - self.keep_last, len(messages) - 1):
+            if self.count(context) <= self.token_budget:
+                break
+            if until > state.get("summarized_turns", 0):
+                self._fold(state, until, spent)
+                context = self._compose(state["summary"], messages[state["summarized_turns"]:])
+
+        self._record_savings(state, context, spent)
+        return context
+
+    def _fold(self, state: Dict[str, Any], until: int, spent: Dict[str, float]):
+        summarized = state.get("summarized_turns", 0)
+        new_turns = state["messages"][summarized:until]
+        if not new_turns:
+            return
+        start = time.perf_counter()
+        state["summary"], tokens = self.summarize(state.get("summary", ""), new_turns)
+        spent["tokens"] += tokens
+        spent["seconds"] += time.perf_counter() - start
+        state["summarized_turns"] = until
+
+    @staticmethod
+    def _compose(summary: str, recent: List[Dict[str, str]]) -> str:
+        parts = []
+        if summary:
+            parts.append(f"Summary of earlier turns:\n{summary}")
+        parts.append(f"Recent turns:\n{format_turns(recent) if recent else 'None yet.'}")
+        return "\n\n".join(parts)
+
+    def _record_savings(self, state: Dict[str, Any], context: str, spent: Dict[str, float]):
+        # Compare against the previous layout, which embedded the whole debate as indented JSON,
+        # net of what the summarizer call (if any) cost this turn
+        full_tokens = self.count(json.dumps(state["messages"], indent=2))
+        compact_tokens = self.count(context)
+        state.setdefault("context_stats", []).append({
+            "turn": len(state["messages"]) + 1,
+            "full_tokens": full_tokens,
+            "compact_tokens": compact_tokens,
+            "summarizer_tokens": spent["tokens"],
+            "summarizer_seconds": round(spent["seconds"], 3),
+            "tokens_saved": full_tokens - compact_tokens - spent["tokens"],
+        })
+
+
+def summarization_prompt(previous_summary: Optional[str], new_turns: List[Dict[str, str]]) -> str:
+    """Prompt asking an LLM to fold new debate turns into the running summary."""
+    return f"""Update the running summary of a debate about whether to pay a ticket.
+Keep every distinct argument and who made it, drop repetition, and stay under 150 words.
+
+Current summary:
+{previous_summary or "None yet."}
+
+New turns to fold in:
+{format_turns(new_turns)}
+
+Return only the updated summary."""
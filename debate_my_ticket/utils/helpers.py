@@ -1,14 +1,26 @@
 import json
 import configparser
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Iterator
 import os
+from functools import lru_cache
 
-def load_config() -> Dict[str, str]:
-    """Load configuration from api.cfg file."""
+@lru_cache(maxsize=1)
+def _read_config() -> configparser.ConfigParser:
     config = configparser.ConfigParser()
     config_path = os.path.join('./api.cfg')
     config.read(config_path)
-    return dict(config['openai'])
+    return config
+
+def load_config() -> Dict[str, str]:
+    """Load configuration from api.cfg file (read once per process)."""
+    return dict(_read_config()['openai'])
+
+def load_config_section(section: str) -> Dict[str, str]:
+    """Load an optional section of api.cfg, empty when it is absent."""
+    config = _read_config()
+    if not config.has_section(section):
+        return {}
+    return dict(config[section])
 
 def parse_agent_response(response: str) -> tuple[bool, str]:
     """Parse agent response to check for concession and extract message."""
@@ -16,43 +28,45 @@ def parse_agent_response(response: str) -> tuple[bool, str]:
         return True, response[8:].strip()
     return False, response.strip()
 
+def stream_with_fallback(tokens: Iterator[str], fallback: str) -> Iterator[str]:
+    """Yield streamed tokens, falling back to a default text if the stream fails before producing any."""
+    produced = False
+    try:
+        for token in tokens:
+            produced = True
+            yield token
+    except Exception as e:
+        if produced:
+            print(f"Warning: stream interrupted: {str(e)}")
+            return
+        yield fallback
+
 def format_debate_history(messages: list[Dict[str, str]]) -> str:
     """Format debate history for prompt context."""
     return "\n".join([f"{msg['role']}: {msg['content']}" for msg in messages])
 
+REQUIRED_TICKET_FIELDS = [
+    'ticket_number',
+    'city',
+    'address',
+    'violation_code',
+    'date',
+    'officer_info',
+    'fine_amount'
+]
+
 def validate_ticket_info(ticket_info: Dict[str, Any]) -> list[str]:
     """Validate ticket information for required fields."""
-    required_fields = [
-        'ticket_number',
-        'city',
-        'address',
-        'violation_code',
-        'date',
-        'officer_info',
-        'fine_amount'
-    ]
-    
-    missing_fields = [field for field in required_fields if field not in ticket_info]
+    missing_fields = [field for field in REQUIRED_TICKET_FIELDS if field not in ticket_info]
     return missing_fields
 
 def save_debate_history(ticket_number: str, debate_history: list[Dict[str, str]]):
-    """Save debate history to a JSON file."""
-    history_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'history')
-    os.makedirs(history_dir, exist_ok=True)
-    
-    file_path = os.path.join(history_dir, f"{ticket_number}.json")
-    with open(file_path, 'w') as f:
-        json.dump(debate_history, f, indent=2)
+    """Save debate history to the history store."""
+    # Imported here because the backend modules import this one
+    from debate_my_ticket.backend.history_store import get_history_store
+    get_history_store().save({'ticket_number': ticket_number, 'debate': debate_history})
 
 def load_debate_history(ticket_number: str) -> Optional[list[Dict[str, str]]]:
-    """Load debate history from a JSON file."""
-    file_path = os.path.join(
-        os.path.dirname(os.path.dirname(__file__)),
-        'history',
-        f"{ticket_number}.json"
-    )
-    
-    if os.path.exists(file_path):
-        with open(file_path, 'r') as f:
-            return json.load(f)
-    return None 
\ No newline at end of file
+    """Load debate history from the history store."""
+    from debate_my_ticket.backend.history_store import get_history_store
+    return get_history_store().get_debate(ticket_number) 
\ No newline at end of file
@@ -0,0 +1,189 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Iterable
+
+# Parameters that change how a request is sent but not what the model answers
+UNCACHED_PARAMS = {'api_key', 'api_base', 'timeout', 'stream', 'metadata'}
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'cache', 'llm')
+
+
+class LLMCache:
+    """Two-tier (memory + disk) cache for LLM responses, keyed on the request content."""
+
+    def __init__(self,
+                 cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+                 max_memory_entries: int = 256,
+                 max_disk_entries: int = 5000,
+                 ttl_seconds: Optional[float] = 7 * 24 * 3600,
+                 disabled_stages: Optional[Iterable[str]] = None):
+        self.cache_dir = cache_dir
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttl_seconds = ttl_seconds
+        self.disabled_stages = set(disabled_stages or [])
+        self._memory: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(model: str, messages: list, **params) -> str:
+        """Build a content-addressed key from the model, messages and sampling parameters."""
+        payload = {
+            'model': model,
+            'messages': messages,
+            'params': {k: v for k, v in params.items() if k not in UNCACHED_PARAMS}
+        }
+        encoded = json.dumps(payload, sort_keys=True, separators=(',', ':'), default=str)
+        return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+    def is_enabled(self, stage: str) -> bool:
+        """Check whether responses for a stage may be served from the cache."""
+        return stage not in self.disabled_stages
+
+    def enable_stage(self, stage: str):
+        self.disabled_stages.discard(stage)
+
+    def disable_stage(self, stage: str):
+        self.disabled_stages.add(stage)
+
+    def get(self, key: str, stage: str = 'default') -> Optional[Dict[str, Any]]:
+        """Return the cached response payload for a key, or None on a miss."""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and self._is_expired(entry):
+                del self._memory[key]
+                entry = None
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self._record(stage, 'hits')
+                return entry['response']
+
+        entry = self._read_disk(key)
+        with self._lock:
+            if entry is None:
+                self._record(stage, 'misses')
+                return None
+            self._remember(key, entry)
+            self._record(stage, 'hits')
+            self._record(stage, 'disk_hits')
+        return entry['response']
+
+    def set(self, key: str, response: Dict[str, Any], stage: str = 'default'):
+        """Store a response payload in both tiers."""
+        entry = {'created_at': time.time(), 'stage': stage, 'response': response}
+        with self._lock:
+            self._remember(key, entry)
+            self._record(stage, 'stores')
+        self._write_disk(key, entry)
+
+    def clear(self):
+        """Drop every cached entry from memory and disk."""
+        with self._lock:
+            self._memory.clear()
+        if self.cache_dir and os.path.isdir(self.cache_dir):
+            for name in os.listdir(self.cache_dir):
+                if name.endswith('.json'):
+                    os.remove(os.path.join(self.cache_dir, name))
+
+    def get_stats(self) -> Dict[str, Dict[str, int]]:
+        """Get hit/miss counters per stage."""
+        with self._lock:
+            return {stage: dict(counters) for stage, counters in self._stats.items()}
+
+    def _record(self, stage: str, counter: str):
+        counters = self._stats.setdefault(stage, {'hits': 0, 'disk_hits': 0, 'misses': 0, 'stores': 0})
+        counters[counter] += 1
+
+    def _is_expired(self, entry: Dict[str, Any]) -> bool:
+        if self.ttl_seconds is None:
+            return False
+        return time.time() - entry['created_at'] > self.ttl_seconds
+
+    def _remember(self, key: str, entry: Dict[str, Any]):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _read_disk(self, key: str) -> Optional[Dict[str, Any]]:
+        if not self.cache_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, 'r') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if self._is_expired(entry):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        # Touch the file so disk eviction follows recency of use
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry
+
+    def _write_disk(self, key: str, entry: Dict[str, Any]):
+        if not self.cache_dir:
+            return
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError) as e:
+            print(f"Warning: could not write LLM cache entry: {str(e)}")
+            return
+        self._evict_disk()
+
+    def _evict_disk(self):
+        """Remove the least recently used files once the disk tier is over capacity."""
+        try:
+            names = [name for name in os.listdir(self.cache_dir) if name.endswith('.json')]
+        except OSError:
+            return
+        overflow = len(names) - self.max_disk_entries
+        if overflow <= 0:
+            return
+        paths = [os.path.join(self.cache_dir, name) for name in names]
+        paths.sort(key=lambda p: os.path.getmtime(p) if os.path.exists(p) else 0)
+        for path in paths[:overflow]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+_default_cache: Optional[LLMCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> LLMCache:
+    """Get the process-wide LLM cache shared by every stage."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = LLMCache()
+        return _default_cache
+
+
+def set_llm_cache(cache: Optional[LLMCache]):
+    """Replace the process-wide LLM cache (None restores the default on next use)."""
+    global _default_cache
+    with _default_cache_lock:
+        _default_cache = cache
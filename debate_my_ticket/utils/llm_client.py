@@ -0,0 +1,247 @@
+import contextvars
+import logging
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from typing import Dict, Any, List, Optional, Iterator, Tuple
+
+import httpx
+import litellm
+from litellm import completion
+
+from debate_my_ticket.utils.helpers import load_config, load_config_section
+from debate_my_ticket.utils.llm_cache import LLMCache, get_llm_cache
+from debate_my_ticket.utils.llm_scheduler import LLMScheduler, estimate_tokens, get_llm_scheduler
+from debate_my_ticket.utils.model_router import ModelRouter, DEFAULT_LATENCY_BUDGETS, DEFAULT_FALLBACK_MODELS
+from debate_my_ticket.utils.single_flight import SingleFlight
+from debate_my_ticket.utils.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+# Model per stage; "<role>.<stage>" entries override the stage default for one agent.
+# Any entry can be overridden from the [models] section of api.cfg. Each stage also has a latency
+# budget (see model_router.py); a model that keeps missing it is swapped for a faster one.
+DEFAULT_MODELS = {
+    'extraction': 'gpt-4o',
+    'local_laws': 'gpt-4o',
+    'social_context': 'gpt-4o',
+    'validation': 'gpt-4o',
+    'opening_argument': 'gpt-4o',
+    'rebuttal': 'gpt-4o',
+    'summary': 'gpt-4o',
+}
+
+DEFAULT_TIMEOUT = 30
+DEFAULT_TEMPERATURE = 0.3
+DEFAULT_MAX_CONNECTIONS = 20
+
+# The caller's own cap on concurrent LLM requests, see llm_slots()
+_slots: contextvars.ContextVar[Optional[threading.BoundedSemaphore]] = contextvars.ContextVar('llm_slots', default=None)
+
+
+@contextmanager
+def llm_slots(semaphore: Optional[threading.BoundedSemaphore]) -> Iterator[None]:
+    """Make the LLM calls inside the block (and in worker threads it starts) hold a slot of semaphore.
+
+    Unlike LLMClient.set_max_in_flight, this only limits the caller, not every user of the shared client.
+    """
+    token = _slots.set(semaphore)
+    try:
+        yield
+    finally:
+        _slots.reset(token)
+
+
+class LLMClient:
+    """Single entry point for LLM calls: config, pooled connections, model choice, caching and rate limits."""
+
+    def __init__(self, config: Optional[Dict[str, str]] = None, cache: Optional[LLMCache] = None,
+                 scheduler: Optional[LLMScheduler] = None):
+        config = config if config is not None else load_config()
+        self.api_key = config['api_key']
+        self.api_base = config.get('api_base') or None
+        self.timeout = float(config.get('timeout', DEFAULT_TIMEOUT))
+        self.temperature = float(config.get('temperature', DEFAULT_TEMPERATURE))
+        self.models = {**DEFAULT_MODELS, **load_config_section('models')}
+        budgets = {stage: float(seconds) for stage, seconds in load_config_section('latency_budgets').items()}
+        self.router = ModelRouter({**DEFAULT_LATENCY_BUDGETS, **budgets},
+                                  {**DEFAULT_FALLBACK_MODELS, **load_config_section('fallback_models')})
+        self.cache = cache or get_llm_cache()
+        self.scheduler = scheduler or get_llm_scheduler()
+        for model in sorted(set(self.models.values()) | set(self.router.fallbacks.values())):
+            if model not in self.scheduler.limits:
+                print(f"Warning: no rate limit for {model}; add it to [rate_limits] in api.cfg")
+        # Identical requests made while one is already in flight wait for it instead of calling again
+        self.single_flight = SingleFlight() if config.get('coalesce', 'true').lower() != 'false' else None
+        self._in_flight: Optional[threading.BoundedSemaphore] = None
+
+        # One keep-alive pool reused by every call instead of a new connection per request
+        max_connections = int(config.get('max_connections', DEFAULT_MAX_CONNECTIONS))
+        limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        litellm.client_session = httpx.Client(limits=limits, timeout=self.timeout)
+        litellm.aclient_session = httpx.AsyncClient(limits=limits, timeout=self.timeout)
+
+        # Verbose mode logs every full request and response; keep it off unless asked for
+        log_level = config.get('log_level', 'WARNING').upper()
+        litellm.set_verbose = log_level == 'DEBUG'
+        litellm.suppress_debug_info = log_level != 'DEBUG'
+        logging.getLogger('LiteLLM').setLevel(log_level)
+        logger.setLevel(log_level)
+
+    def model_for(self, stage: str, role: Optional[str] = None) -> str:
+        """Get the configured model for a stage, honouring per-role overrides."""
+        if role and f"{role}.{stage}" in self.models:
+            return self.models[f"{role}.{stage}"]
+        return self.models[stage]
+
+    def set_max_in_flight(self, limit: Optional[int]):
+        """Cap the number of LLM requests this client sends concurrently, for every caller (None removes the cap)."""
+        self._in_flight = threading.BoundedSemaphore(limit) if limit else None
+
+    def complete(self, stage: str, messages: List[Dict[str, Any]], role: Optional[str] = None, **params):
+        """Run a completion for a stage, serving repeated requests from the cache."""
+        request, routed = self._build_request(stage, messages, role, params)
+        with tracer.span(f"llm.{stage}", model=request['model'], role=role, routed=routed):
+            use_cache = self.cache.is_enabled(stage)
+            key = self.cache.make_key(**request)
+            if use_cache:
+                cached = self.cache.get(key, stage)
+                if cached is not None:
+                    tracer.record_llm_response(None, cached=True)
+                    return litellm.ModelResponse(**cached)
+
+            def call():
+                response = self._call(stage, request)
+                # Fill the cache before the in-flight entry goes away, so no later request falls in between
+                if use_cache:
+                    self.cache.set(key, _response_to_dict(response), stage)
+                return response
+
+            if self.single_flight is None:
+                response, shared = call(), False
+            else:
+                response, shared = self.single_flight.do(key, call)
+            if shared:
+                # Each caller gets its own copy of the leader's response
+                tracer.record('coalesced')
+                return litellm.ModelResponse(**_response_to_dict(response))
+
+            tracer.record_llm_response(response)
+            return response
+
+    def stream(self, stage: str, messages: List[Dict[str, Any]], role: Optional[str] = None, **params) -> Iterator[str]:
+        """Stream the response text as it arrives, replaying cached responses in a single chunk."""
+        request, routed = self._build_request(stage, messages, role, params)
+        span = tracer.start_span(f"llm.{stage}", model=request['model'], role=role, routed=routed, stream=True)
+        try:
+            use_cache = self.cache.is_enabled(stage)
+            if use_cache:
+                key = self.cache.make_key(**request)
+                cached = self.cache.get(key, stage)
+                if cached is not None:
+                    tracer.record_llm_response(None, cached=True, span=span)
+                    yield litellm.ModelResponse(**cached).choices[0].message.content or ''
+                    return
+
+            chunks = []
+            with self._slot():
+                # Only opening the stream is retried; a stream failing midway is raised to the caller
+                stream = self.scheduler.call(request['model'], estimate_tokens(request),
+                                             lambda: self._send(stage, request, stream=True), span=span)
+                for chunk in stream:
+                    if not chunks:
+                        span.set(time_to_first_token=span.elapsed())
+                    chunks.append(chunk)
+                    # The closing usage chunk has no choices
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if delta:
+                        yield delta
+
+            if chunks:
+                # Rebuild a regular response from the chunks for usage accounting and later cache hits
+                response = litellm.stream_chunk_builder(chunks, messages=messages)
+                tracer.record_llm_response(response, span=span)
+                if use_cache:
+                    self.cache.set(key, _response_to_dict(response), stage)
+                self.router.observe(stage, request['model'], span.elapsed())
+        except Exception as e:
+            span.error = f"{type(e).__name__}: {str(e)}"
+            span.add('errors')
+            raise
+        finally:
+            tracer.end_span(span)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get the response cache, request coalescing, rate-limit scheduler and per-stage latency counters."""
+        return {
+            'cache': self.cache.get_stats(),
+            'routing': self.router.get_stats(),
+            'coalescing': self.single_flight.get_stats() if self.single_flight else None,
+            'scheduler': self.scheduler.get_stats(),
+        }
+
+    def _call(self, stage: str, request: Dict[str, Any]):
+        def send():
+            with self._slot():
+                return self._send(stage, request)
+        start = time.perf_counter()
+        try:
+            return self.scheduler.call(request['model'], estimate_tokens(request), send)
+        finally:
+            # Includes rate-limit waits: they count against the stage's budget just like a slow model
+            self.router.observe(stage, request['model'], time.perf_counter() - start)
+
+    def _build_request(self, stage: str, messages: List[Dict[str, Any]], role: Optional[str],
+                       params: Dict[str, Any]) -> Tuple[Dict[str, Any], Optional[str]]:
+        """Build the request and report why the model was rerouted (None when it was not)."""
+        model, routed = params.pop('model', None), None
+        if model is None:
+            model, routed = self.router.route(stage, self.model_for(stage, role))
+        request = {
+            'model': model,
+            'messages': messages,
+            'temperature': self.temperature,
+        }
+        request.update(params)
+        return request, routed
+
+    def _send(self, stage: str, request: Dict[str, Any], stream: bool = False):
+        logger.debug("LLM call stage=%s model=%s stream=%s", stage, request['model'], stream)
+        return completion(
+            api_key=self.api_key,
+            api_base=self.api_base,
+            timeout=self.timeout,
+            stream=stream,
+            # Ask for usage at the end of a stream too, so cached prompt tokens are reported for streamed turns
+            stream_options={'include_usage': True} if stream else None,
+            **request
+        )
+
+    @contextmanager
+    def _slot(self):
+        # The caller's own cap applies on top of the client-wide one
+        with ExitStack() as stack:
+            for semaphore in (_slots.get(), self._in_flight):
+                if semaphore is not None:
+                    stack.enter_context(semaphore)
+            yield
+
+
+def _response_to_dict(response: Any) -> Dict[str, Any]:
+    if hasattr(response, 'model_dump'):
+        # litellm's partially filled response models make pydantic warn about every dump
+        return response.model_dump(warnings=False)
+    return dict(response)
+
+
+_default_client: Optional[LLMClient] = None
+_default_client_lock = threading.Lock()
+
+
+def get_llm_client() -> LLMClient:
+    """Get the process-wide LLM client shared by every stage."""
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = LLMClient()
+        return _default_client
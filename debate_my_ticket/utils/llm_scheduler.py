@@ -0,0 +1,225 @@
+import contextvars
+import heapq
+import itertools
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, Callable, Iterator, List, Optional, Tuple
+
+from debate_my_ticket.utils.helpers import load_config_section
+from debate_my_ticket.utils.tracing import Span, tracer
+
+# Lower runs first: a user waiting on the app or the API goes ahead of batch work
+INTERACTIVE = 0
+BATCH = 10
+
+# (requests per minute, tokens per minute) per model; override in the [rate_limits] section of api.cfg.
+# Every model the router can fall back to needs an entry, or rerouted calls go out unthrottled.
+DEFAULT_LIMITS = {
+    'gpt-4o': (500, 30000),
+    'gpt-4o-mini': (500, 200000),
+    'gpt-4': (500, 10000),
+}
+
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_BASE_DELAY = 1.0
+DEFAULT_MAX_DELAY = 30.0
+# Completion budget assumed for requests that do not set max_tokens
+DEFAULT_COMPLETION_TOKENS = 500
+
+# Errors worth retrying: throttling, timeouts and transient server failures
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+RETRYABLE_ERRORS = {'RateLimitError', 'Timeout', 'APITimeoutError', 'APIConnectionError',
+                    'ServiceUnavailableError', 'InternalServerError'}
+
+_priority: contextvars.ContextVar[int] = contextvars.ContextVar('llm_priority', default=INTERACTIVE)
+
+
+@contextmanager
+def llm_priority(priority: int) -> Iterator[None]:
+    """Run the LLM calls made inside the block (and in worker threads it starts) at the given priority."""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def estimate_tokens(request: Dict[str, Any]) -> int:
+    """Rough token cost of a request before it is sent: prompt characters / 4 plus the completion budget."""
+    prompt_chars = sum(len(str(message.get('content', ''))) for message in request.get('messages', []))
+    return prompt_chars // 4 + int(request.get('max_tokens') or DEFAULT_COMPLETION_TOKENS)
+
+
+def is_retryable(error: Exception) -> bool:
+    if getattr(error, 'status_code', None) in RETRYABLE_STATUS_CODES:
+        return True
+    return type(error).__name__ in RETRYABLE_ERRORS
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+    try:
+        return float(headers.get('retry-after'))
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Allows up to per_minute units per minute, refilled continuously."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def delay(self, amount: float) -> float:
+        """Seconds until amount units are available (0 when they are now)."""
+        self._refill()
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def take(self, amount: float):
+        self._refill()
+        self.tokens -= amount
+
+    def refund(self, amount: float):
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+
+class LLMScheduler:
+    """Keeps each model within its request and token budgets, serving waiting calls by priority.
+
+    Calls that fail with a rate limit or a transient error are retried with jittered exponential
+    backoff, going through the budgets again.
+    """
+
+    def __init__(self, limits: Optional[Dict[str, Tuple[float, float]]] = None, max_retries: int = DEFAULT_MAX_RETRIES,
+                 base_delay: float = DEFAULT_BASE_DELAY, max_delay: float = DEFAULT_MAX_DELAY):
+        self.limits = dict(DEFAULT_LIMITS if limits is None else limits)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._buckets: Dict[str, Tuple[TokenBucket, TokenBucket]] = {
+            model: (TokenBucket(rpm), TokenBucket(tpm)) for model, (rpm, tpm) in self.limits.items()
+        }
+        self._waiting: Dict[str, List[Tuple[int, int]]] = {}
+        self._sequence = itertools.count()
+        self._cond = threading.Condition()
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    def call(self, model: str, estimated_tokens: int, func: Callable[[], Any], span: Optional[Span] = None) -> Any:
+        """Run func once the model's budgets allow it, retrying transient failures."""
+        span = span or tracer.current()
+        for attempt in range(self.max_retries + 1):
+            waited = self.acquire(model, estimated_tokens)
+            if span is not None and waited:
+                span.add('queue_wait_seconds', waited)
+            try:
+                result = func()
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    raise
+                # Honour the provider's Retry-After, else back off exponentially with full jitter
+                delay = min(self.max_delay, _retry_after(e) or random.uniform(0, self.base_delay * 2 ** attempt))
+                self._record(model, 'retries')
+                if span is not None:
+                    span.add('retries')
+                time.sleep(delay)
+                continue
+            self._settle(model, estimated_tokens, result)
+            return result
+
+    def acquire(self, model: str, tokens: int, priority: Optional[int] = None) -> float:
+        """Block until the model has room for one request of this many tokens; returns the seconds waited."""
+        buckets = self._buckets.get(model)
+        self._record(model, 'requests')
+        if buckets is None:
+            return 0.0
+        requests_bucket, tokens_bucket = buckets
+        # A request larger than the whole budget would never fit; let it through once the bucket is full
+        tokens = min(tokens, tokens_bucket.capacity)
+        entry = (_priority.get() if priority is None else priority, next(self._sequence))
+        start = time.monotonic()
+        with self._cond:
+            queue = self._waiting.setdefault(model, [])
+            heapq.heappush(queue, entry)
+            try:
+                while True:
+                    if queue[0] != entry:
+                        self._cond.wait()
+                        continue
+                    delay = max(requests_bucket.delay(1), tokens_bucket.delay(tokens))
+                    if delay <= 0:
+                        requests_bucket.take(1)
+                        tokens_bucket.take(tokens)
+                        break
+                    self._cond.wait(delay)
+            finally:
+                queue.remove(entry)
+                heapq.heapify(queue)
+                self._cond.notify_all()
+        waited = time.monotonic() - start
+        with self._cond:
+            stats = self._stats[model]
+            stats['wait_seconds'] += waited
+            stats['max_wait_seconds'] = max(stats['max_wait_seconds'], waited)
+        return waited
+
+    def get_stats(self) -> Dict[str, Dict[str, float]]:
+        """Get per-model request, retry and wait counters and the current queue depth."""
+        with self._cond:
+            return {model: {**stats, 'queued': len(self._waiting.get(model, []))}
+                    for model, stats in self._stats.items()}
+
+    def _settle(self, model: str, estimated_tokens: int, result: Any):
+        # Correct the token budget by the difference between the estimate and the real usage
+        usage = getattr(result, 'usage', None)
+        total = getattr(usage, 'total_tokens', None)
+        buckets = self._buckets.get(model)
+        if buckets is None or not total:
+            return
+        with self._cond:
+            buckets[1].refund(min(estimated_tokens, buckets[1].capacity) - total)
+            self._cond.notify_all()
+
+    def _record(self, model: str, counter: str):
+        with self._cond:
+            stats = self._stats.setdefault(model, {'requests': 0, 'retries': 0, 'wait_seconds': 0.0, 'max_wait_seconds': 0.0})
+            stats[counter] += 1
+
+
+def load_limits() -> Dict[str, Tuple[float, float]]:
+    """Read per-model limits from [rate_limits] in api.cfg, e.g. `gpt-4o = 500, 30000` (requests, tokens per minute)."""
+    limits = dict(DEFAULT_LIMITS)
+    for model, value in load_config_section('rate_limits').items():
+        try:
+            rpm, tpm = (float(part) for part in value.split(','))
+        except ValueError:
+            print(f"Warning: ignoring invalid rate limit for {model}: {value}")
+            continue
+        limits[model] = (rpm, tpm)
+    return limits
+
+
+_default_scheduler: Optional[LLMScheduler] = None
+_default_scheduler_lock = threading.Lock()
+
+
+def get_llm_scheduler() -> LLMScheduler:
+    """Get the process-wide scheduler shared by every LLM client."""
+    global _default_scheduler
+    with _default_scheduler_lock:
+        if _default_scheduler is None:
+            _default_scheduler = LLMScheduler(load_limits())
+        return _default_scheduler
@@ -0,0 +1,110 @@
+import math
+import threading
+import time
+from collections import deque
+from typing import Dict, Any, Deque, Optional, Tuple
+
+# Seconds each stage may take before it holds up the rest of the ticket; override in [latency_budgets] of api.cfg
+DEFAULT_LATENCY_BUDGETS = {
+    'extraction': 10.0,
+    'local_laws': 8.0,
+    'social_context': 8.0,
+    'validation': 8.0,
+    'opening_argument': 12.0,
+    'rebuttal': 12.0,
+    'summary': 15.0,
+}
+
+# Faster model to switch to when a model keeps missing a stage's budget; override in [fallback_models]
+DEFAULT_FALLBACK_MODELS = {
+    'gpt-4': 'gpt-4o',
+    'gpt-4o': 'gpt-4o-mini',
+}
+
+# Recent calls only: once a slow spell is older than the window the configured model is tried again
+DEFAULT_WINDOW_SECONDS = 300
+DEFAULT_MIN_SAMPLES = 5
+
+
+def percentile(values, pct: float) -> float:
+    """Nearest-rank percentile of a list of numbers (0 when empty)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+class ModelRouter:
+    """Picks the model for each stage call, moving to a faster model while the configured one is over budget.
+
+    A model is considered at risk for a stage when the p95 latency of its recent calls for that
+    stage exceeds the stage's budget.
+    """
+
+    def __init__(self, budgets: Optional[Dict[str, float]] = None, fallbacks: Optional[Dict[str, str]] = None,
+                 window_seconds: float = DEFAULT_WINDOW_SECONDS, min_samples: int = DEFAULT_MIN_SAMPLES):
+        self.budgets = dict(DEFAULT_LATENCY_BUDGETS if budgets is None else budgets)
+        self.fallbacks = dict(DEFAULT_FALLBACK_MODELS if fallbacks is None else fallbacks)
+        self.window_seconds = window_seconds
+        self.min_samples = min_samples
+        self._samples: Dict[Tuple[str, str], Deque[Tuple[float, float]]] = {}
+        self._fallbacks_taken: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def route(self, stage: str, model: str) -> Tuple[str, Optional[str]]:
+        """Get the model to call for a stage and, when it is not the configured one, why."""
+        budget = self.budgets.get(stage)
+        if budget is None:
+            return model, None
+        # Follow the chain (gpt-4 -> gpt-4o -> ...) until a model is within budget or has no faster option
+        seen = {model}
+        while model in self.fallbacks and self._p95(stage, model) > budget:
+            faster = self.fallbacks[model]
+            if faster in seen:
+                break
+            seen.add(faster)
+            model = faster
+        if len(seen) == 1:
+            return model, None
+        with self._lock:
+            self._fallbacks_taken[stage] = self._fallbacks_taken.get(stage, 0) + 1
+        return model, 'over_budget'
+
+    def observe(self, stage: str, model: str, seconds: float):
+        """Record how long a call took."""
+        with self._lock:
+            samples = self._samples.setdefault((stage, model), deque(maxlen=200))
+            samples.append((time.monotonic(), seconds))
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Get recent latency per stage and model, with the budget and how often the router fell back."""
+        with self._lock:
+            keys = list(self._samples)
+            fallbacks_taken = dict(self._fallbacks_taken)
+        stats: Dict[str, Dict[str, Any]] = {}
+        for stage, model in keys:
+            durations = self._recent(stage, model)
+            entry = stats.setdefault(stage, {'budget_seconds': self.budgets.get(stage),
+                                             'fallbacks': fallbacks_taken.get(stage, 0), 'models': {}})
+            entry['models'][model] = {
+                'calls': len(durations),
+                'p50_seconds': round(percentile(durations, 50), 3),
+                'p95_seconds': round(percentile(durations, 95), 3),
+            }
+        return stats
+
+    def _p95(self, stage: str, model: str) -> float:
+        durations = self._recent(stage, model)
+        if len(durations) < self.min_samples:
+            return 0.0
+        return percentile(durations, 95)
+
+    def _recent(self, stage: str, model: str):
+        cutoff = time.monotonic() - self.window_seconds
+        with self._lock:
+            samples = self._samples.get((stage, model))
+            if not samples:
+                return []
+            while samples and samples[0][0] < cutoff:
+                samples.popleft()
+            return [seconds for _, seconds in samples]
@@ -1,47 +1,124 @@
-PRO_PAYMENT_PROMPT = """You are a legal assistant arguing in favor of paying the ticket. 
-Consider the following information:
-- Ticket details: {ticket_info}
-- Local laws: {local_laws}
-- Social context: {social_context}
-- Previous debate: {previous_debate}
+from typing import Dict, Any, List
+
+from debate_my_ticket.utils.ticket import Ticket, TicketLike
+
+# Every debate call starts with the same system prompt and the same case message for a ticket, and
+# only then the role and turn. Providers cache a repeated prompt prefix once the prompt reaches a
+# minimum length (1024 tokens for OpenAI), so the system prompt carries the full debate brief: it is
+# shared by every ticket, and with the case appended the prefix clears that minimum on its own.
+DEBATE_SYSTEM_PROMPT = """You are a top-tier legal expert taking part in a debate about a ticket.
+One side argues in favor of paying the ticket: it weighs legal precedents, financial implications,
+court costs, time investment and practical outcomes. The other side argues against paying: it looks
+for legal technicalities, procedural errors, missing evidence and defense strategies, citing
+successful challenge cases. The last message tells you which side you are on and what to do this turn.
+
+How to assess the case:
+- Completeness of the ticket: a ticket number, the date and time, the exact location, the violation
+  code with its description, the fine amount and the issuing officer's name or badge number. A
+  missing or contradictory required element is a procedural defect that often leads to dismissal.
+- The violation itself: whether the cited code matches the described conduct and the location,
+  whether the rule was in force at that date and time, and whether it applies to this kind of vehicle.
+- Signage and markings: posted hours, faded curb paint, obstructed or missing signs, and
+  temporary restrictions that were not posted with enough notice.
+- Evidence: photographs, meter or sensor records, officer notes, witness statements and the
+  driver's own records such as receipts, parking app sessions, timestamps and repair invoices.
+- Timing: grace periods, clock differences between the officer's device and the meter, and the
+  deadlines to pay, to request a review and to ask for a hearing.
+- Cost of paying: the fine, late fees and escalation, points on a license, insurance increases
+  and early payment discounts or payment plans the city offers.
+- Cost of challenging: time off work, travel to a hearing, the chance of a higher penalty, the
+  burden of proof in the city's process and how often similar tickets are dismissed there.
+- Local practice: the local laws and the social context of the case, such as how strictly the city
+  enforces this violation and what other drivers report about contesting it.
 
-Your task is to argue why the ticket should be paid. Keep your response under 100 words.
-If you believe the ticket should be paid, start your response with "CONCEDE: " followed by your reasoning.
-Otherwise, provide your argument."""
+Defenses that commonly succeed, and when they do not:
+- Defective ticket: works when a required element is missing or wrong, rarely for a simple typo
+  that does not change the meaning.
+- Inadequate signage: works with photos taken soon after the ticket, weak without evidence.
+- Broken meter or payment system: works when it was reported or the city's own records confirm it.
+- Emergency or necessity: works for documented medical or vehicle emergencies, not for convenience.
+- Officer error: works when the officer's own notes, photos or timestamps contradict the ticket.
+- Paying is usually the better choice when the evidence is clear, the fine is small compared with
+  the cost of a hearing, or an early payment discount is about to expire.
 
-ANTI_PAYMENT_PROMPT = """You are a legal assistant arguing against paying the ticket.
-Consider the following information:
+How to argue:
+- Ground every point in the ticket details, the local laws and the social context of the case;
+  do not invent facts, codes or precedents that the case does not support.
+- Lead with your strongest point, then support it with one or two specific details.
+- Weigh the likely outcome against the cost in money and time, not just whether a defense exists.
+- Address the specific points of the other side when you are given a counterargument, and concede
+  the points that are clearly right instead of repeating yourself.
+- Keep responses under 100 words but ensure they are thorough and persuasive.
+
+Format rules for every turn:
+- If the other side has convinced you, start your response with "CONCEDE: " followed by your reasoning.
+- End with a final line "CONFIDENCE: <0-100>" saying how confident you are in your side."""
+
+DEBATE_CASE_PROMPT = """The case:
 - Ticket details: {ticket_info}
 - Local laws: {local_laws}
-- Social context: {social_context}
-- Previous debate: {previous_debate}
+- Social context: {social_context}"""
+
+PRO_PAYMENT_PROMPT = """You argue in favor of paying the ticket. This is the opening argument.
+Argue why the ticket should be paid, with concrete evidence and specific legal points.
+If you believe the ticket should be challenged instead, start your response with "CONCEDE: " followed by your reasoning.
+End with a final line "CONFIDENCE: <0-100>" saying how confident you are that the ticket should be paid."""
+
+ANTI_PAYMENT_PROMPT = """You argue against paying the ticket. This is the opening argument.
+Argue why the ticket should be challenged, with specific legal precedents and successful challenge cases.
+If you believe the ticket should be paid instead, start your response with "CONCEDE: " followed by your reasoning.
+End with a final line "CONFIDENCE: <0-100>" saying how confident you are that the ticket should be challenged."""
 
-Your task is to argue why the ticket should be challenged. Keep your response under 100 words.
-If you believe the ticket should be challenged, start your response with "CONCEDE: " followed by your reasoning.
-Otherwise, provide your argument."""
+PRO_REBUTTAL_PROMPT = """You argue in favor of paying the ticket. The other side said:
+{counterargument}
 
-TICKET_VALIDATION_PROMPT = """Analyze the following ticket information for potential legal issues:
+Provide a strong rebuttal that addresses its specific points."""
+
+ANTI_REBUTTAL_PROMPT = """You argue against paying the ticket and defend the position to challenge it. The other side said:
+{counterargument}
+
+Provide a strong rebuttal that addresses its specific points, using legal precedents and successful challenge cases."""
+
+REBUTTAL_SIGNALS = """If the counterargument has convinced you, start your response with "CONCEDE: " followed by your reasoning.
+End with a final line "CONFIDENCE: <0-100>" saying how confident you still are in your position."""
+
+
+def debate_messages(ticket_info: TicketLike, context: Dict[str, Any], turn_prompt: str) -> List[Dict[str, str]]:
+    """Messages for a debate turn: the shared prefix (system prompt, then the case) and the turn last."""
+    case = DEBATE_CASE_PROMPT.format(
+        ticket_info=Ticket.coerce(ticket_info).canonical,
+        local_laws=context.get('local_laws', 'No specific local laws found.'),
+        social_context=context.get('social_context', 'No social context available.')
+    )
+    return [
+        {"role": "system", "content": DEBATE_SYSTEM_PROMPT},
+        {"role": "user", "content": case},
+        {"role": "user", "content": turn_prompt},
+    ]
+
+LEGAL_FLAWS_PROMPT = """Analyze the following ticket information for potential legal flaws:
 {ticket_info}
 
-Check for:
-1. Missing required signatures
-2. Date inconsistencies
-3. Incorrect formatting
-4. Missing required fields
-5. Other potential legal flaws
+Required fields, dates, the fine amount format and the officer signature have already been checked.
+These issues were found:
+{known_issues}
 
-Provide a list of any issues found."""
+List only other legal flaws, one per line. If there are none, answer "None"."""
 
-INFO_EXTRACTION_PROMPT = """Extract the following information from the ticket text:
+FIELD_EXTRACTION_PROMPT = """Extract the following fields from the ticket text:
 {ticket_text}
 
-Required fields:
-1. Ticket number
-2. City
-3. Address
-4. Violation description/code
-5. Date and time
-6. Officer information
-7. Fine amount
+Fields to extract (use exactly these JSON keys):
+{fields}
+
+Format the output as a JSON object. Omit any field that does not appear in the text.""" 
+
+DEBATE_SUMMARY_PROMPT = """Please analyze the following debate about a ticket and provide a concise summary with:
+1. Key points from both sides
+2. The strength of each argument
+3. A clear recommendation on whether to pay or challenge the ticket
+
+Debate content:
+{debate_content}
 
-Format the output as a JSON object.""" 
\ No newline at end of file
+Please provide a well-structured summary that helps the user make an informed decision."""
\ No newline at end of file
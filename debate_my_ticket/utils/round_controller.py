@@ -0,0 +1,84 @@
+import re
+from difflib import SequenceMatcher
+from typing import Dict, Any, Optional
+
+from debate_my_ticket.utils.helpers import parse_agent_response
+
+STOP_CONCESSION = 'concession'
+STOP_CONFIDENCE = 'low_confidence'
+STOP_CONVERGENCE = 'convergence'
+STOP_MAX_ROUNDS = 'max_rounds'
+
+_CONFIDENCE_PATTERN = re.compile(r'\s*CONFIDENCE:\s*(\d{1,3})\s*%?\s*$', re.IGNORECASE)
+
+
+def parse_turn(role: str, text: str) -> Dict[str, Any]:
+    """Split an agent reply into its message and the CONCEDE / CONFIDENCE signals it carries."""
+    conceded, content = parse_agent_response(text.strip())
+    confidence = None
+    match = _CONFIDENCE_PATTERN.search(content)
+    if match:
+        confidence = min(int(match.group(1)), 100)
+        content = content[:match.start()].rstrip()
+    return {'role': role, 'content': content, 'conceded': conceded, 'confidence': confidence}
+
+
+def similarity(a: str, b: str) -> float:
+    """Word-level similarity ratio between two turns (1.0 means identical)."""
+    return SequenceMatcher(None, a.lower().split(), b.lower().split(), autojunk=False).ratio()
+
+
+class RoundController:
+    """Decides after each round whether the debate still has something to add."""
+
+    def __init__(self, max_rounds: int = 3, similarity_threshold: float = 0.85, min_confidence: int = 25):
+        self.max_rounds = max_rounds
+        # Rebuttals at least this similar to the same agent's previous turn count as repeating
+        self.similarity_threshold = similarity_threshold
+        # An agent this unsure of its own side has effectively given up
+        self.min_confidence = min_confidence
+
+    def check(self, round_number: int, turns: Dict[str, Dict[str, Any]],
+              previous: Optional[Dict[str, str]] = None) -> Optional[Dict[str, Any]]:
+        """Get the stop decision for a finished round, or None to keep debating.
+
+        turns maps each role to its parsed turn (see parse_turn), previous maps each role to the
+        content of its turn in the round before.
+        """
+        conceded = [role for role, turn in turns.items() if turn['conceded']]
+        if conceded:
+            return self._stop(STOP_CONCESSION, round_number, roles=conceded)
+
+        unsure = [role for role, turn in turns.items()
+                  if turn['confidence'] is not None and turn['confidence'] <= self.min_confidence]
+        if unsure:
+            return self._stop(STOP_CONFIDENCE, round_number, roles=unsure,
+                              confidence={role: turns[role]['confidence'] for role in unsure})
+
+        if previous:
+            scores = {role: round(similarity(turn['content'], previous[role]), 3)
+                      for role, turn in turns.items() if role in previous}
+            if scores and all(score >= self.similarity_threshold for score in scores.values()):
+                return self._stop(STOP_CONVERGENCE, round_number, similarity=scores)
+
+        if round_number >= self.max_rounds:
+            return self._stop(STOP_MAX_ROUNDS, round_number)
+        return None
+
+    @staticmethod
+    def _stop(reason: str, round_number: int, **details) -> Dict[str, Any]:
+        return {'reason': reason, 'round': round_number, **details}
+
+
+def describe_stop(stop: Dict[str, Any]) -> str:
+    """Human readable reason for why a debate ended."""
+    names = {'pro_payment': 'the pro-payment agent', 'anti_payment': 'the anti-payment agent'}
+    roles = ' and '.join(names.get(role, role) for role in stop.get('roles', []))
+    rounds = f"{stop['round']} round{'s' if stop['round'] != 1 else ''}"
+    if stop['reason'] == STOP_CONCESSION:
+        return f"Debate ended after {rounds}: {roles} conceded."
+    if stop['reason'] == STOP_CONFIDENCE:
+        return f"Debate ended after {rounds}: {roles} lost confidence in their position."
+    if stop['reason'] == STOP_CONVERGENCE:
+        return f"Debate ended after {rounds}: both agents were repeating their arguments."
+    return f"Debate ended after the maximum of {rounds}."
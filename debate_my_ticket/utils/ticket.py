@@ -0,0 +1,112 @@
+import hashlib
+import json
+from collections.abc import Mapping
+from types import MappingProxyType
+from typing import Dict, Any, Iterator, Optional, Union
+
+from debate_my_ticket.utils.helpers import REQUIRED_TICKET_FIELDS
+
+
+# Marks a standard field the ticket does not have; None is a value like any other (as in a dict)
+_MISSING = object()
+
+
+class Ticket(Mapping):
+    """Fields extracted from a ticket, passed between the extraction, context, validation and debate stages.
+
+    Reads like a dict (`ticket['city']`, `ticket.get('date')`, `'date' in ticket`) so the rules and
+    scrapers work on it unchanged; a field set to None is present with the value None. The canonical
+    serialization is computed once and reused for every prompt and for hashing; every write goes
+    through `ticket[key] = value` or a field attribute, which invalidates it.
+    """
+
+    FIELDS = tuple(REQUIRED_TICKET_FIELDS)
+    __slots__ = FIELDS + ('_extra', '_canonical', '_digest')
+
+    def __init__(self, extra: Optional[Dict[str, Any]] = None, **fields):
+        for field in self.FIELDS:
+            object.__setattr__(self, field, fields.pop(field, _MISSING))
+        # Anything beyond the standard fields (additional context, signature, raw text, ...)
+        object.__setattr__(self, '_extra', {**(extra or {}), **fields})
+        object.__setattr__(self, '_canonical', None)
+        object.__setattr__(self, '_digest', None)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Ticket':
+        fields = {field: data[field] for field in cls.FIELDS if field in data}
+        return cls({key: value for key, value in data.items() if key not in cls.FIELDS}, **fields)
+
+    @classmethod
+    def coerce(cls, data: 'TicketLike') -> 'Ticket':
+        """Accept either a Ticket or a plain dict of fields (e.g. from a caller outside the pipeline)."""
+        return data if isinstance(data, Ticket) else cls.from_dict(dict(data or {}))
+
+    @property
+    def extra(self) -> Mapping:
+        """Read-only view of the non-standard fields; set them with `ticket[key] = value`."""
+        return MappingProxyType(self._extra)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Plain JSON serializable dict, standard fields first; fields that were never set are left out."""
+        data = {field: getattr(self, field) for field in self.FIELDS if getattr(self, field) is not _MISSING}
+        data.update(self._extra)
+        return data
+
+    @property
+    def canonical(self) -> str:
+        """Compact JSON with a fixed key order: the same ticket always renders to the same prompt text."""
+        if self._canonical is None:
+            data = {field: getattr(self, field) for field in self.FIELDS if getattr(self, field) is not _MISSING}
+            data.update(sorted(self._extra.items()))
+            object.__setattr__(self, '_canonical', json.dumps(data, separators=(',', ':'), ensure_ascii=False, default=str))
+        return self._canonical
+
+    @property
+    def digest(self) -> str:
+        """Stable hash of the canonical form, usable as a cache key."""
+        if self._digest is None:
+            object.__setattr__(self, '_digest', hashlib.sha256(self.canonical.encode('utf-8')).hexdigest())
+        return self._digest
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self.FIELDS:
+            value = getattr(self, key)
+            if value is _MISSING:
+                raise KeyError(key)
+            return value
+        return self._extra[key]
+
+    def __setitem__(self, key: str, value: Any):
+        if key in self.FIELDS:
+            setattr(self, key, value)
+        else:
+            self._extra[key] = value
+            self._invalidate()
+
+    def __setattr__(self, name: str, value: Any):
+        object.__setattr__(self, name, value)
+        if name in self.FIELDS:
+            self._invalidate()
+
+    def __iter__(self) -> Iterator[str]:
+        for field in self.FIELDS:
+            if getattr(self, field) is not _MISSING:
+                yield field
+        yield from self._extra
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __reduce__(self):
+        # Copies and pickles rebuild from the plain fields, so unset fields stay unset
+        return Ticket.from_dict, (self.to_dict(),)
+
+    def __repr__(self) -> str:
+        return f"Ticket({self.canonical})"
+
+    def _invalidate(self):
+        object.__setattr__(self, '_canonical', None)
+        object.__setattr__(self, '_digest', None)
+
+
+TicketLike = Union[Ticket, Dict[str, Any]]
@@ -0,0 +1,225 @@
+import contextvars
+import functools
+import json
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, List, Callable, Iterator, Optional
+
+_current_span: contextvars.ContextVar[Optional['Span']] = contextvars.ContextVar('current_span', default=None)
+
+# Numeric span fields that are summed up per span name for the metrics endpoint
+COUNTERS = ('prompt_tokens', 'cached_prompt_tokens', 'completion_tokens', 'cost_usd', 'llm_calls', 'cache_hits',
+            'coalesced', 'retries', 'queue_wait_seconds', 'fallbacks', 'errors')
+
+
+class Span:
+    def __init__(self, name: str, parent: Optional['Span'] = None, **attributes):
+        self.name = name
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex
+        self.attributes: Dict[str, Any] = dict(attributes)
+        self.start_time = time.time()
+        self._start = time.perf_counter()
+        self.duration: Optional[float] = None
+        self.counters: Dict[str, float] = {name: 0 for name in COUNTERS}
+        self.error: Optional[str] = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def add(self, counter: str, value: float = 1):
+        self.counters[counter] = self.counters.get(counter, 0) + value
+
+    def elapsed(self) -> float:
+        """Seconds since the span started, or its duration once it has ended."""
+        if self.duration is not None:
+            return self.duration
+        return time.perf_counter() - self._start
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'start_time': self.start_time,
+            'duration_seconds': self.duration,
+            'error': self.error,
+            **{k: v for k, v in self.counters.items() if v},
+            'attributes': self.attributes,
+        }
+
+
+class Tracer:
+    """Records timed spans for pipeline stages and aggregates them into exportable metrics."""
+
+    def __init__(self, max_spans: int = 10000, jsonl_path: Optional[str] = None):
+        self.jsonl_path = jsonl_path
+        self._spans: deque = deque(maxlen=max_spans)
+        self._totals: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str, **attributes) -> Iterator[Span]:
+        """Time a block of work as a child of the current span."""
+        span = self.start_span(name, **attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except Exception as e:
+            span.error = f"{type(e).__name__}: {str(e)}"
+            span.add('errors')
+            raise
+        finally:
+            _current_span.reset(token)
+            self.end_span(span)
+
+    def start_span(self, name: str, **attributes) -> Span:
+        """Start a span without making it current; generators use this so their span cannot leak to the consumer."""
+        return Span(name, _current_span.get(), **attributes)
+
+    def end_span(self, span: Span):
+        span.duration = span.elapsed()
+        self._finish(span)
+
+    def current(self) -> Optional[Span]:
+        return _current_span.get()
+
+    def record(self, counter: str, value: float = 1):
+        """Add to a counter on the current span (no-op outside of any span)."""
+        span = _current_span.get()
+        if span is not None:
+            span.add(counter, value)
+
+    def record_fallback(self, error: Exception):
+        """Mark the current span as having swallowed an error and returned a canned result."""
+        span = _current_span.get()
+        if span is not None:
+            span.add('fallbacks')
+            span.add('errors')
+            span.error = f"{type(error).__name__}: {str(error)}"
+
+    def record_llm_response(self, response: Any, cached: bool = False, span: Optional[Span] = None):
+        """Record token usage and cost of an LLM response on the given (or current) span."""
+        span = span or _current_span.get()
+        if span is None:
+            return
+        if cached:
+            span.add('cache_hits')
+            return
+        span.add('llm_calls')
+        usage = getattr(response, 'usage', None)
+        if usage is not None:
+            span.add('prompt_tokens', getattr(usage, 'prompt_tokens', 0) or 0)
+            span.add('completion_tokens', getattr(usage, 'completion_tokens', 0) or 0)
+            # Prompt tokens the provider served from its prefix cache (billed lower and faster to process)
+            details = getattr(usage, 'prompt_tokens_details', None)
+            if isinstance(details, dict):
+                span.add('cached_prompt_tokens', details.get('cached_tokens') or 0)
+            elif details is not None:
+                span.add('cached_prompt_tokens', getattr(details, 'cached_tokens', 0) or 0)
+        try:
+            import litellm
+            span.add('cost_usd', litellm.completion_cost(completion_response=response) or 0)
+        except Exception:
+            # Unknown models (e.g. local stand-ins) have no price
+            pass
+
+    def spans(self, trace_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Get finished spans, optionally only those of one trace."""
+        with self._lock:
+            spans = list(self._spans)
+        return [span.to_dict() for span in spans if trace_id is None or span.trace_id == trace_id]
+
+    def clear(self):
+        with self._lock:
+            self._spans.clear()
+            self._totals.clear()
+
+    def export_jsonl(self, path: str, trace_id: Optional[str] = None):
+        """Append finished spans to a JSON lines file."""
+        with open(path, 'a') as f:
+            for span in self.spans(trace_id):
+                f.write(json.dumps(span, default=str) + '\n')
+
+    def prometheus_text(self) -> str:
+        """Render aggregated per-span metrics in the Prometheus text exposition format."""
+        with self._lock:
+            totals = {name: dict(values) for name, values in self._totals.items()}
+        lines = [
+            '# HELP debate_span_seconds Wall time spent in each pipeline span.',
+            '# TYPE debate_span_seconds summary',
+        ]
+        for name, values in sorted(totals.items()):
+            lines.append(f'debate_span_seconds_sum{{span="{name}"}} {values["seconds"]:.6f}')
+            lines.append(f'debate_span_seconds_count{{span="{name}"}} {int(values["count"])}')
+        for counter in COUNTERS:
+            lines.append(f'# TYPE debate_span_{counter}_total counter')
+            for name, values in sorted(totals.items()):
+                lines.append(f'debate_span_{counter}_total{{span="{name}"}} {values.get(counter, 0):g}')
+        return '\n'.join(lines) + '\n'
+
+    def serve_metrics(self, port: int, host: str = '127.0.0.1') -> ThreadingHTTPServer:
+        """Serve /metrics (Prometheus text) and /spans (JSON lines) from a background thread."""
+        tracer = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == '/metrics':
+                    body, content_type = tracer.prometheus_text(), 'text/plain; version=0.0.4'
+                elif self.path == '/spans':
+                    body = ''.join(json.dumps(span, default=str) + '\n' for span in tracer.spans())
+                    content_type = 'application/x-ndjson'
+                else:
+                    self.send_error(404)
+                    return
+                encoded = body.encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(encoded)))
+                self.end_headers()
+                self.wfile.write(encoded)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+    def _finish(self, span: Span):
+        with self._lock:
+            self._spans.append(span)
+            totals = self._totals.setdefault(span.name, {'seconds': 0.0, 'count': 0})
+            totals['seconds'] += span.duration
+            totals['count'] += 1
+            for counter, value in span.counters.items():
+                totals[counter] = totals.get(counter, 0) + value
+        if self.jsonl_path:
+            with self._lock, open(self.jsonl_path, 'a') as f:
+                f.write(json.dumps(span.to_dict(), default=str) + '\n')
+
+
+tracer = Tracer()
+
+
+def traced(name: str):
+    """Decorator that runs the function inside a span of the process-wide tracer."""
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with tracer.span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def submit_in_context(executor, func: Callable, *args, **kwargs):
+    """Submit work to an executor so spans opened by it nest under the caller's current span."""
+    context = contextvars.copy_context()
+    return executor.submit(context.run, func, *args, **kwargs)
@@ -0,0 +1,25 @@
+import pytest
+
+from debate_my_ticket.backend.ticket_parser import TicketParser
+
+
+@pytest.mark.parametrize('text, expected', [
+    ("Fine Amount: $1,250.00", "$1250.00"),
+    ("Fine Amount: $1,250", "$1250.00"),
+    ("Fine Amount: $125.00", "$125.00"),
+    ("Fine Amount: $125,00", "$125.00"),
+    ("Fine Amount: $1250", "$1250.00"),
+    ("Pay $2,500.00 by the due date", "$2500.00"),
+])
+def test_fine_amount(text, expected):
+    assert TicketParser().parse(text)['fine_amount'] == expected
+
+
+@pytest.mark.parametrize('amount, expected', [
+    ("1,250.00", "$1250.00"),
+    ("12,345", "$12345.00"),
+    ("45,50", "$45.50"),
+    ("45", "$45.00"),
+])
+def test_normalize_amount(amount, expected):
+    assert TicketParser._normalize_amount(amount) == expected